@@ -0,0 +1,112 @@
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+# Mots ignorés lors de la comparaison (après normalisation : minuscules, sans accents).
+# Les négations n'en font pas partie : elles changent le sens de la réponse.
+MOTS_VIDES = frozenset(
+    """
+    a au aux avec c ce ces cet cette d dans de des du elle en est et il ils j l la le les
+    leur leurs m mais ou par pour qu que qui s sa se ses son sont sur t un une
+    the an of to and or is are in on for with by
+    """.split()
+)
+
+# Marques de négation (« n'est pas », « ne ... jamais », « not », « isn't »...)
+NEGATIONS = frozenset("ne pas non jamais aucun aucune rien not no never none".split())
+
+SEUIL_MOT = 0.8  # Similarité minimale de deux mots pour qu'ils se correspondent (fautes de frappe)
+SEUIL_CORRECT = 0.7  # Score à partir duquel une réponse est jugée juste
+
+_NON_ALPHANUMERIQUE = re.compile(r"[^0-9a-z]+")
+# Signes diacritiques combinants (accents séparés de leur lettre par la forme NFKD)
+_DIACRITIQUES = re.compile(
+    "[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]"
+)
+
+
+def normalize(texte):
+    # Minuscules, sans accents ni ponctuation, espaces uniques
+    texte = (texte or "").lower()
+    if not texte.isascii():
+        texte = _DIACRITIQUES.sub("", unicodedata.normalize("NFKD", texte))
+    return _NON_ALPHANUMERIQUE.sub(" ", texte).strip()
+
+
+def tokenize(normalisee):
+    # Mots significatifs (hors mots vides) d'un texte normalisé, sans doublon et triés
+    return tuple(sorted({mot for mot in normalisee.split() if mot not in MOTS_VIDES}))
+
+
+def prepare(reponse):
+    """
+    Forme précalculée d'une réponse attendue : (texte normalisé, mots séparés par
+    des espaces). Calculée une fois à l'écriture de la carte (table card_answers).
+    """
+    normalisee = normalize(reponse)
+    return normalisee, " ".join(tokenize(normalisee))
+
+
+def _word_similarity(attendu, saisi):
+    # Les nombres et les mots courts doivent être exacts ; les autres tolèrent
+    # une faute de frappe. Les filtres rapides évitent le calcul complet.
+    if attendu == saisi:
+        return 1.0
+    if len(attendu) <= 3 or attendu.isdigit() or saisi.isdigit():
+        return 0.0
+    matcher = SequenceMatcher(None, attendu, saisi)
+    if matcher.real_quick_ratio() < SEUIL_MOT or matcher.quick_ratio() < SEUIL_MOT:
+        return 0.0
+    ratio = matcher.ratio()
+    return ratio if ratio >= SEUIL_MOT else 0.0
+
+
+def score(mots_attendus, mots_saisis):
+    """
+    Similarité (entre 0 et 1) de deux ensembles de mots : chaque mot attendu est
+    apparié au mot saisi le plus proche, puis rappel et précision sont combinés en
+    F2 (le rappel des mots attendus compte quatre fois plus que les mots en trop).
+    """
+    if not mots_attendus:
+        return 1.0 if not mots_saisis else 0.0
+    if not mots_saisis:
+        return 0.0
+    saisis = set(mots_saisis)
+    communs = saisis.intersection(mots_attendus)
+    restants = saisis - communs
+    total = float(len(communs))
+    for attendu in mots_attendus:
+        if attendu not in communs and restants:
+            total += max(_word_similarity(attendu, saisi) for saisi in restants)
+    rappel = total / len(mots_attendus)
+    precision = min(total / len(saisis), 1.0)
+    if rappel == 0.0:
+        return 0.0
+    return 5 * precision * rappel / (4 * precision + rappel)
+
+
+def is_negated(normalisee):
+    # Vrai si le texte normalisé contient une négation ; « isn't » devient « isn t »
+    mots = normalisee.split()
+    return any(mot in NEGATIONS for mot in mots) or any(
+        mot == "t" and precedent.endswith("n") for precedent, mot in zip(mots, mots[1:])
+    )
+
+
+def grade(normalisee, mots, saisie, seuil=SEUIL_CORRECT):
+    """
+    Corrige une saisie d'après la forme précalculée (normalisee, mots) de la réponse
+    attendue. Renvoie (juste, score) ; une saisie identique après normalisation
+    est juste avec un score de 1, une saisie négative face à une réponse affirmative
+    est fausse avec un score de 0. Une négation attendue mais omise compte comme
+    un mot manquant.
+    """
+    saisie = normalize(saisie)
+    if not saisie:
+        return False, 0.0
+    if saisie == normalisee:
+        return True, 1.0
+    if is_negated(saisie) and not is_negated(normalisee):
+        return False, 0.0
+    s = score(mots.split(), tokenize(saisie))
+    return s >= seuil, round(s, 3)
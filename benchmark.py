@@ -0,0 +1,264 @@
+"""
+Banc d'essai des chemins critiques de flashcard_db sur une base synthétique.
+
+Exemple :
+    python benchmark.py --themes 50 --cards 200000 --years 3 --output resultats.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from flashcard_db import (
+    Database,
+    FlashcardApp,
+    get_pool,
+    instrumentation,
+    store_answers,
+)
+
+
+# === Génération d'une base synthétique ===
+def generate_database(db_name, nb_themes, nb_cards, nb_years, seed=0):
+    # Crée le schéma puis remplit themes, cards et stats avec des données aléatoires
+    rng = random.Random(seed)
+    Database(db_name).init_db()
+
+    conn = sqlite3.connect(db_name)
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO themes (id_theme, theme) VALUES (?, ?)",
+            [(i, f"Thème {i}") for i in range(1, nb_themes + 1)],
+        )
+        lot = 50000
+        for start in range(0, nb_cards, lot):
+            conn.executemany(
+                """
+                INSERT INTO cards (question, reponse, probabilite, id_theme)
+                VALUES (?, ?, ?, ?)
+                """,
+                (
+                    (
+                        f"Question {i} " + "x" * rng.randint(20, 200),
+                        f"Réponse {i} " + "y" * rng.randint(20, 800),
+                        round(rng.uniform(0.1, 1.0), 3),
+                        rng.randint(1, nb_themes),
+                    )
+                    for i in range(start, min(start + lot, nb_cards))
+                ),
+            )
+            # Réponses normalisées, comme à l'écriture par FlashcardManager
+            store_answers(
+                conn,
+                conn.execute(
+                    "SELECT id, reponse FROM cards WHERE id > ?", (start,)
+                ).fetchall(),
+            )
+        debut = date.today() - timedelta(days=365 * nb_years)
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO stats (bonnes_reponses, mauvaises_reponses, date)
+            VALUES (?, ?, ?)
+            """,
+            (
+                (rng.randint(0, 50), rng.randint(0, 20), str(debut + timedelta(days=d)))
+                for d in range(365 * nb_years)
+            ),
+        )
+    conn.close()
+
+
+def copy_database(source, destination):
+    # Copie cohérente d'une base (journal WAL compris) par l'API de sauvegarde SQLite
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(destination)
+    with dst:
+        src.backup(dst)
+    dst.close()
+    src.close()
+
+
+# === Mesure ===
+def measure(fn, repeat, warmup=2):
+    # Exécute fn plusieurs fois et renvoie les durées (en ms) des exécutions mesurées
+    durees = []
+    for i in range(warmup + repeat):
+        debut = time.perf_counter()
+        fn()
+        if i >= warmup:
+            durees.append((time.perf_counter() - debut) * 1000)
+    return durees
+
+
+def uncached(pool, fn):
+    # fn précédée de la vidange du cache de lecture : chaque appel lit la base
+    def wrapper():
+        pool.cache.clear()
+        return fn()
+
+    return wrapper
+
+
+def summarize(durees):
+    # Latences (ms) et débit (appels/s) d'une série de mesures
+    centiles = statistics.quantiles(durees, n=100, method="inclusive")
+    return {
+        "runs": len(durees),
+        "mean_ms": statistics.fmean(durees),
+        "p50_ms": centiles[49],
+        "p90_ms": centiles[89],
+        "p99_ms": centiles[98],
+        "max_ms": max(durees),
+        "ops_per_s": len(durees) / (sum(durees) / 1000) if sum(durees) else None,
+    }
+
+
+def run_benchmarks(db_name, nb_themes, repeat, quiz_size, seed=0):
+    rng = random.Random(seed)
+    fa = FlashcardApp(db_name)
+    fm, sm = fa.fm, fa.sm
+    pool = get_pool(db_name)
+
+    # Données de départ : tous les ids de cartes, et un paquet sur 20 % des thèmes
+    theme_ids = rng.sample(range(1, nb_themes + 1), max(1, nb_themes // 5))
+    card_ids = [i for i, _ in fm.get_card_weights_by_themes(range(1, nb_themes + 1))]
+    deck = fa.get_deck(theme_ids)
+
+    # Chaque cas : nom -> (fonction, nombre de répétitions)
+    cas = {
+        "get_deck": (lambda: fa.get_deck(theme_ids), repeat),
+        "get_cards_by_themes": (lambda: fa.get_cards_by_themes(theme_ids), repeat),
+        "pick_card_weighted": (
+            lambda: fa.pick_card_weighted(deck, k=quiz_size),
+            repeat,
+        ),
+        "draw_quiz": (lambda: fa.draw_quiz(theme_ids, k=quiz_size), repeat),
+        "update_stats": (lambda: sm.update_stats(rng.random() < 0.7), repeat * 10),
+        "update_card_probability": (
+            lambda: sm.update_card_probability(
+                rng.choice(card_ids), rng.random() < 0.7
+            ),
+            repeat * 10,
+        ),
+        "record_answer": (
+            lambda: sm.record_answer(rng.choice(card_ids), rng.random() < 0.7),
+            repeat * 10,
+        ),
+        "search": (
+            lambda: fm.search(f"Question {rng.randrange(len(card_ids))}"),
+            repeat,
+        ),
+        "grade": (
+            lambda: fa.grader.grade(rng.choice(card_ids), "reponse yyyyyyyy"),
+            repeat * 10,
+        ),
+        "grade_many": (
+            lambda: fa.grader.grade_many(
+                (rng.choice(card_ids), "reponse yyyyyyyy") for _ in range(100)
+            ),
+            repeat,
+        ),
+    }
+    # Lectures mises en cache : sans cache (lecture de la base à chaque appel)
+    # et avec cache (appels répétés sans écriture entre eux), mesurées séparément
+    lectures = {
+        "get_all_cards": (fm.get_all_cards, max(3, repeat // 5)),
+        "get_stats": (sm.get_stats, repeat),
+        "get_stats_series": (
+            lambda: sm.get_stats_series(bucket=rng.choice(["day", "week", "month"])),
+            repeat,
+        ),
+    }
+    for nom, (fn, n) in lectures.items():
+        cas[nom] = (uncached(pool, fn), n)
+        cas[f"{nom} (cache)"] = (fn, repeat * 10)
+
+    resultats = {}
+    for nom, (fn, n) in cas.items():
+        resultats[nom] = summarize(measure(fn, n))
+    return resultats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--themes", type=int, default=20, help="nombre de thèmes")
+    parser.add_argument("--cards", type=int, default=50000, help="nombre de cartes")
+    parser.add_argument("--years", type=int, default=2, help="années de statistiques")
+    parser.add_argument("--repeat", type=int, default=30, help="répétitions par mesure")
+    parser.add_argument("--quiz-size", type=int, default=20, help="cartes par quizz")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--db",
+        help="base à utiliser (générée si absente, temporaire par défaut) ; "
+        "une base existante est copiée : les mesures d'écriture ne la modifient pas",
+    )
+    parser.add_argument("--output", help="fichier JSON où écrire les résultats")
+    parser.add_argument(
+        "--instrument",
+        action="store_true",
+        help="ajoute au rapport les mesures par méthode (requêtes, lignes)",
+    )
+    args = parser.parse_args()
+
+    tmpdir = None
+    db_name = args.db
+    if db_name is None or os.path.exists(db_name):
+        tmpdir = tempfile.TemporaryDirectory()
+        db_name = os.path.join(tmpdir.name, "bench.db")
+        if args.db is not None:
+            # Les mesures écrivent des réponses et des statistiques factices
+            copy_database(args.db, db_name)
+            print(f"Mesures sur une copie de {args.db} : {db_name}")
+    if not os.path.exists(db_name):
+        debut = time.perf_counter()
+        generate_database(db_name, args.themes, args.cards, args.years, args.seed)
+        print(
+            f"Base synthétique générée en {time.perf_counter() - debut:.1f} s : {db_name}"
+        )
+
+    if args.instrument:
+        instrumentation.enable()
+
+    rapport = {
+        "params": vars(args),
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "results": run_benchmarks(
+            db_name, args.themes, args.repeat, args.quiz_size, args.seed
+        ),
+    }
+
+    if args.instrument:
+        rapport["instrumentation"] = instrumentation.report()
+
+    print(
+        f"{'chemin':<26}{'p50 (ms)':>10}{'p90 (ms)':>10}{'p99 (ms)':>10}{'ops/s':>12}"
+    )
+    for nom, r in rapport["results"].items():
+        print(
+            f"{nom:<26}{r['p50_ms']:>10.3f}{r['p90_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+            f"{r['ops_per_s']:>12.1f}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rapport, f, indent=2, ensure_ascii=False)
+        print(f"Résultats écrits dans {args.output}")
+
+    get_pool(db_name).close_all()
+    if tmpdir is not None:
+        tmpdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import functools
+import hashlib
+import itertools
+import zlib
+
+from answer_grading import normalize
+
+TAILLE_SHINGLE = 4  # Les textes sont découpés en suites de 4 caractères
+NB_BANDES = 8  # Bandes de l'index LSH
+LIGNES_PAR_BANDE = 4  # Valeurs MinHash par bande
+# Similarité (Jaccard) à partir de laquelle deux cartes sont signalées
+SEUIL_DOUBLON = 0.8
+# Shingles hachés ensemble au plus : la matrice de calcul (32 valeurs de 8 octets
+# par shingle) reste sous 30 Mo quelle que soit la taille du lot
+MAX_SHINGLES_CALCUL = 100000
+
+# Permutations h(x) = (a * x + b) mod p des valeurs de hachage des shingles.
+# Coefficients dérivés de leur rang : identiques d'un processus et d'une version à l'autre,
+# sinon les clés enregistrées en base ne correspondraient plus.
+_PREMIER = (1 << 31) - 1
+_NB_HASH = NB_BANDES * LIGNES_PAR_BANDE
+
+
+@functools.cache
+def _coefficients():
+    # NumPy n'est chargé qu'au premier calcul de signature : importer flashcard_db
+    # (démarrage de l'application) ne le charge pas
+    import numpy as np
+
+    a = np.array(
+        [zlib.crc32(f"a{i}".encode()) % (_PREMIER - 1) + 1 for i in range(_NB_HASH)],
+        dtype=np.uint64,
+    )
+    b = np.array(
+        [zlib.crc32(f"b{i}".encode()) % _PREMIER for i in range(_NB_HASH)],
+        dtype=np.uint64,
+    )
+    return np, a, b
+
+
+def shingles(question, reponse):
+    # Ensemble des suites de TAILLE_SHINGLE caractères du texte normalisé de la carte
+    texte = normalize(f"{question or ''} {reponse or ''}")
+    if len(texte) <= TAILLE_SHINGLE:
+        return {texte} if texte else set()
+    return {
+        texte[i : i + TAILLE_SHINGLE] for i in range(len(texte) - TAILLE_SHINGLE + 1)
+    }
+
+
+def jaccard(a, b):
+    # Similarité exacte de deux ensembles de shingles
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def signatures(ensembles):
+    """
+    Signatures MinHash d'ensembles de shingles non vides (une ligne par ensemble) :
+    pour chaque permutation, la plus petite valeur de hachage. Deux signatures
+    coïncident sur une position avec une probabilité égale à la similarité de
+    Jaccard des ensembles. Calcul vectorisé, par paquets d'au plus
+    MAX_SHINGLES_CALCUL shingles (un ensemble plus grand forme un paquet à lui seul).
+    """
+    np, _, _ = _coefficients()
+    resultats = []
+    paquet, total = [], 0
+    for ensemble in ensembles:
+        if paquet and total + len(ensemble) > MAX_SHINGLES_CALCUL:
+            resultats.append(_signatures_paquet(paquet))
+            paquet, total = [], 0
+        paquet.append(ensemble)
+        total += len(ensemble)
+    if paquet:
+        resultats.append(_signatures_paquet(paquet))
+    return np.concatenate(resultats)
+
+
+def _signatures_paquet(ensembles):
+    np, a, b = _coefficients()
+    tailles = [len(e) for e in ensembles]
+    x = np.fromiter(
+        map(zlib.crc32, map(str.encode, itertools.chain.from_iterable(ensembles))),
+        dtype=np.uint64,
+        count=sum(tailles),
+    )
+    # a < 2**31 et x < 2**32 : le calcul tient dans 64 bits. Calcul sur place :
+    # une seule matrice (permutations × shingles) en mémoire
+    valeurs = np.multiply(a[:, None], x[None, :])
+    valeurs += b[:, None]
+    valeurs %= _PREMIER
+    debuts = np.cumsum([0] + tailles[:-1])
+    return np.minimum.reduceat(valeurs, debuts, axis=1).T
+
+
+def band_keys_many(ensembles):
+    """
+    Clés LSH (bande, clé) de chaque ensemble de shingles : deux cartes partagent
+    une clé si leurs signatures coïncident sur toute une bande. Avec 8 bandes de
+    4 valeurs, une paire de similarité 0.8 partage au moins une clé dans 98 % des
+    cas, une paire de similarité 0.3 dans 6 % des cas. Un ensemble vide n'a pas de clé.
+    """
+    cles = [[] for _ in ensembles]
+    non_vides = [i for i, e in enumerate(ensembles) if e]
+    if not non_vides:
+        return cles
+    sigs = signatures([ensembles[i] for i in non_vides]).astype("<u8")
+    for i, sig in zip(non_vides, sigs):
+        for bande in range(NB_BANDES):
+            morceau = sig[bande * LIGNES_PAR_BANDE : (bande + 1) * LIGNES_PAR_BANDE]
+            digest = hashlib.blake2b(morceau.tobytes(), digest_size=8).digest()
+            cles[i].append((bande, int.from_bytes(digest, "little", signed=True)))
+    return cles
+
+
+def band_keys(ensemble):
+    # Clés LSH d'un seul ensemble de shingles
+    return band_keys_many([ensemble])[0]
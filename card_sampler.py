@@ -0,0 +1,176 @@
+import heapq
+import math
+import random
+
+
+def sample_without_replacement(items, weights, k, rng=random):
+    """
+    Tire k éléments distincts, pondérés par weights (méthode d'Efraimidis-Spirakis).
+    Chaque élément reçoit la clé log(u) / w et on garde les k plus grandes : O(n log k).
+    Les éléments de poids nul ne sont tirés que s'il n'y a pas assez d'éléments pondérés.
+    """
+    items = list(items)
+    k = min(k, len(items))
+    if k <= 0:
+        return []
+
+    cles = []
+    nuls = []
+    for item, w in zip(items, weights):
+        if w > 0:
+            # 1 - random() est dans ]0, 1] : évite log(0)
+            cles.append((math.log(1.0 - rng.random()) / w, len(cles), item))
+        else:
+            nuls.append(item)
+
+    tirage = [item for _, _, item in heapq.nlargest(k, cles)]
+    if len(tirage) < k:
+        # Complète uniformément avec les éléments de poids nul
+        tirage.extend(rng.sample(nuls, k - len(tirage)))
+    return tirage
+
+
+class FenwickSampler:
+    """
+    Tirage pondéré sur un ensemble de clés (ex. identifiants de cartes) grâce à un
+    arbre de Fenwick sur les poids : tirage et mise à jour d'un poids en O(log n),
+    tirage de k clés distinctes en O(k log n).
+    """
+
+    def __init__(self, keys, weights, rng=random):
+        self.keys = list(keys)
+        self.rng = rng
+        self._index = {key: i for i, key in enumerate(self.keys)}
+        self._weights = [max(float(w), 0.0) for w in weights]
+        n = len(self.keys)
+
+        # Construction de l'arbre en O(n)
+        self._tree = [0.0] * (n + 1)
+        for i in range(1, n + 1):
+            self._tree[i] += self._weights[i - 1]
+            parent = i + (i & -i)
+            if parent <= n:
+                self._tree[parent] += self._tree[i]
+
+        # Plus grande puissance de 2 <= n, point de départ de la descente
+        self._top = 1 << (n.bit_length() - 1) if n else 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def weight(self, key):
+        return self._weights[self._index[key]]
+
+    def total(self):
+        # Somme de tous les poids (préfixe complet de l'arbre)
+        i, s = len(self.keys), 0.0
+        while i > 0:
+            s += self._tree[i]
+            i -= i & -i
+        return s
+
+    def update(self, key, weight):
+        # Remplace le poids d'une clé en O(log n)
+        i = self._index[key]
+        weight = max(float(weight), 0.0)
+        delta = weight - self._weights[i]
+        self._weights[i] = weight
+        i += 1
+        while i <= len(self.keys):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _find(self, target):
+        # Premier indice dont la somme préfixe dépasse target
+        pos, bit = 0, self._top
+        while bit:
+            nxt = pos + bit
+            if nxt <= len(self.keys) and self._tree[nxt] <= target:
+                pos = nxt
+                target -= self._tree[nxt]
+            bit >>= 1
+        return min(pos, len(self.keys) - 1)
+
+    def draw(self):
+        # Tire une clé proportionnellement à son poids (None si tous les poids sont nuls)
+        for _ in range(8):
+            total = self.total()
+            if total <= 0:
+                return None
+            i = self._find(self.rng.random() * total)
+            # Les arrondis flottants peuvent pointer un poids nul : on retire
+            if self._weights[i] > 0:
+                return self.keys[i]
+        return None
+
+    def sample(self, k):
+        # Tire k clés distinctes : chaque clé tirée est mise à zéro puis restaurée
+        k = min(k, len(self.keys))
+        tirage, retirees = [], []
+        try:
+            while len(tirage) < k:
+                key = self.draw()
+                if key is None:
+                    break
+                retirees.append((key, self.weight(key)))
+                self.update(key, 0.0)
+                tirage.append(key)
+        finally:
+            for key, weight in reversed(retirees):
+                self.update(key, weight)
+
+        if len(tirage) < k:
+            # Poids tous nuls : complète uniformément
+            choisies = set(tirage)
+            reste = [key for key in self.keys if key not in choisies]
+            tirage.extend(self.rng.sample(reste, k - len(tirage)))
+        return tirage
+
+
+class AliasTable:
+    """
+    Table d'alias (méthode de Vose) pour des tirages répétés *avec* remise :
+    construction en O(n), puis chaque tirage en O(1).
+    À reconstruire lorsque les poids changent.
+    """
+
+    def __init__(self, keys, weights, rng=random):
+        self.keys = list(keys)
+        self.rng = rng
+        n = len(self.keys)
+        weights = [max(float(w), 0.0) for w in weights]
+        total = sum(weights)
+        if total <= 0:
+            weights, total = [1.0] * n, float(n)  # Repli uniforme
+
+        self._prob = [0.0] * n
+        self._alias = [0] * n
+        scaled = [w * n / total for w in weights]
+        petits = [i for i, p in enumerate(scaled) if p < 1.0]
+        grands = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while petits and grands:
+            s, g = petits.pop(), grands.pop()
+            self._prob[s] = scaled[s]
+            self._alias[s] = g
+            scaled[g] -= 1.0 - scaled[s]
+            (petits if scaled[g] < 1.0 else grands).append(g)
+        for i in petits + grands:
+            self._prob[i] = 1.0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def draw(self):
+        if not self.keys:
+            return None
+        i = int(self.rng.random() * len(self.keys))
+        if self.rng.random() >= self._prob[i]:
+            i = self._alias[i]
+        return self.keys[i]
+
+    def sample(self, k):
+        return [self.draw() for _ in range(k)]
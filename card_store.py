@@ -0,0 +1,136 @@
+import itertools
+import random
+from array import array
+
+from card_sampler import sample_without_replacement
+
+
+class Card:
+    """
+    Une carte : id, question, reponse, probabilite, id_theme. Type renvoyé par toutes
+    les lectures de cartes de FlashcardManager (get_card, get_all_cards, search...).
+    Attributs nommés (carte.question) ; l'accès par position (carte[1]) reste possible
+    pour le code écrit avec les tuples renvoyés par sqlite3.
+    Non modifiable, comme un tuple : les lectures mises en cache partagent leurs cartes.
+    """
+
+    __slots__ = ("id", "question", "reponse", "probabilite", "id_theme")
+
+    def __init__(self, id, question, reponse, probabilite, id_theme):
+        _set = object.__setattr__
+        _set(self, "id", id)
+        _set(self, "question", question)
+        _set(self, "reponse", reponse)
+        _set(self, "probabilite", probabilite)
+        _set(self, "id_theme", id_theme)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Card non modifiable : {name}")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Card non modifiable : {name}")
+
+    @classmethod
+    def from_row(cls, row):
+        # Ligne (id, question, reponse, probabilite, id_theme) lue avec CARD_COLUMNS ;
+        # d'éventuelles colonnes suivantes sont ignorées
+        return cls(*row[:5])
+
+    @classmethod
+    def from_rows(cls, rows):
+        # Liste de cartes à partir de lignes (id, question, reponse, probabilite, id_theme)
+        return list(itertools.starmap(cls, rows))
+
+    def astuple(self):
+        return (self.id, self.question, self.reponse, self.probabilite, self.id_theme)
+
+    def __getitem__(self, i):
+        return self.astuple()[i]
+
+    def __iter__(self):
+        return iter(self.astuple())
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __eq__(self, other):
+        if isinstance(other, Card):
+            return self.astuple() == other.astuple()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.astuple())
+
+    def __repr__(self):
+        return f"Card(id={self.id!r}, question={self.question!r}, id_theme={self.id_theme!r})"
+
+
+class Deck:
+    """
+    Paquet de cartes rangé par colonnes : ids, thèmes et probabilités dans des tableaux
+    typés contigus (24 octets par carte). Le texte n'est pas gardé en mémoire :
+    il est lu à la demande par loader(ids) -> liste de Card.
+    Les tirages pondérés travaillent directement sur le tableau des probabilités.
+    """
+
+    __slots__ = ("ids", "id_themes", "probabilites", "_loader", "_positions")
+
+    def __init__(self, ids=(), id_themes=(), probabilites=(), loader=None):
+        self.ids = array("q", ids)
+        self.id_themes = array("q", id_themes)  # 0 : carte sans thème
+        self.probabilites = array("d", probabilites)
+        self._loader = loader
+        self._positions = None  # id -> position, construit au premier besoin
+
+    @classmethod
+    def from_rows(cls, rows, loader=None):
+        # Construit le paquet à partir de lignes (id, id_theme, probabilite)
+        deck = cls(loader=loader)
+        deck.extend(rows)
+        return deck
+
+    def extend(self, rows):
+        # Ajoute des lignes (id, id_theme, probabilite) : thème NULL -> 0, probabilité NULL -> 0
+        for card_id, id_theme, probabilite in rows:
+            self.ids.append(card_id)
+            self.id_themes.append(id_theme or 0)
+            self.probabilites.append(probabilite if probabilite is not None else 0.0)
+        self._positions = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, card_id):
+        return card_id in self._index()
+
+    def __iter__(self):
+        # Cartes complètes, texte lu par lots
+        for start in range(0, len(self.ids), 500):
+            yield from self.cards(self.ids[start : start + 500])
+
+    def _index(self):
+        if self._positions is None:
+            self._positions = {card_id: i for i, card_id in enumerate(self.ids)}
+        return self._positions
+
+    def probabilite(self, card_id):
+        return self.probabilites[self._index()[card_id]]
+
+    def set_probabilite(self, card_id, probabilite):
+        self.probabilites[self._index()[card_id]] = probabilite
+
+    def sample(self, k, rng=random):
+        # k identifiants distincts, pondérés par la probabilité
+        return sample_without_replacement(self.ids, self.probabilites, k, rng)
+
+    def cards(self, card_ids):
+        # Cartes complètes (texte compris) des ids donnés, dans l'ordre des ids
+        if self._loader is None:
+            raise ValueError("❌ Ce paquet ne sait pas charger le texte des cartes.")
+        return self._loader(list(card_ids))
+
+    def nbytes(self):
+        # Mémoire occupée par les tableaux (hors objet et index)
+        return sum(
+            a.itemsize * len(a) for a in (self.ids, self.id_themes, self.probabilites)
+        )
@@ -0,0 +1,236 @@
+"""
+Façade asyncio des gestionnaires de flashcard_db.
+
+Les requêtes SQLite restent bloquantes : elles sont exécutées sur des threads
+pour ne pas bloquer la boucle d'événements. Les lectures partagent une réserve
+bornée de threads (lectures concurrentes, permises par le mode WAL) ; les écritures
+passent toutes par un unique thread, donc sont sérialisées dans le processus.
+
+Exemple :
+    app = AsyncFlashcardApp()
+    tirage = await app.draw_quiz([1, 2], k=10)
+    carte = await app.fm.get_card(tirage[0])
+    await app.record_answer(carte[0], True, 4.2)
+"""
+
+import asyncio
+import atexit
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flashcard_db import (
+    DB_PATH,
+    DuplicateManager,
+    FlashcardApp,
+    FlashcardManager,
+    GradingManager,
+    SchedulerManager,
+    StatsManager,
+    ThemeManager,
+    UserManager,
+)
+
+
+class AsyncExecutor:
+    """
+    Exécute les appels bloquants des gestionnaires hors de la boucle d'événements :
+    max_readers threads pour les lectures, un seul thread pour les écritures.
+    Chaque thread emprunte sa propre connexion à la réserve du fichier ; garder
+    max_readers + 1 sous la taille de la réserve (8) évite d'en rouvrir.
+    """
+
+    def __init__(self, max_readers=4):
+        self._readers = ThreadPoolExecutor(
+            max_workers=max_readers, thread_name_prefix="flashcards-lecture"
+        )
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="flashcards-ecriture"
+        )
+
+    async def read(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._readers, functools.partial(fn, *args, **kwargs)
+        )
+
+    async def write(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._writer, functools.partial(fn, *args, **kwargs)
+        )
+
+    def shutdown(self, wait=True):
+        # Les écritures déjà soumises sont menées à terme si wait est vrai
+        self._readers.shutdown(wait=wait)
+        self._writer.shutdown(wait=wait)
+
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def get_executor():
+    # Exécuteur partagé par toutes les façades créées sans exécuteur explicite :
+    # les écritures de tout le processus passent par le même thread
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = AsyncExecutor()
+            atexit.register(_default_executor.shutdown)
+        return _default_executor
+
+
+def _read(name):
+    # Version asynchrone d'une méthode de lecture du gestionnaire enveloppé
+    async def method(self, *args, **kwargs):
+        return await self.executor.read(getattr(self.manager, name), *args, **kwargs)
+
+    method.__name__ = name
+    return method
+
+
+def _write(name):
+    # Version asynchrone d'une méthode d'écriture (sérialisée)
+    async def method(self, *args, **kwargs):
+        return await self.executor.write(getattr(self.manager, name), *args, **kwargs)
+
+    method.__name__ = name
+    return method
+
+
+class _AsyncManager:
+    manager_class = None
+
+    def __init__(self, db_name=DB_PATH, executor=None, manager=None):
+        self.manager = manager or self.manager_class(db_name)
+        self.executor = executor or get_executor()
+
+
+class AsyncFlashcardManager(_AsyncManager):
+    manager_class = FlashcardManager
+
+    create_card = _write("create_card")
+    update_card = _write("update_card")
+    delete_card = _write("delete_card")
+
+    get_card = _read("get_card")
+    get_all_cards = _read("get_all_cards")
+    get_number_of_cards = _read("get_number_of_cards")
+    get_cards_page = _read("get_cards_page")
+    search = _read("search")
+    get_cards_by_theme = _read("get_cards_by_theme")
+    get_cards_by_themes = _read("get_cards_by_themes")
+    get_deck = _read("get_deck")
+    get_card_weights_by_themes = _read("get_card_weights_by_themes")
+    get_cards_by_ids = _read("get_cards_by_ids")
+
+
+class AsyncThemeManager(_AsyncManager):
+    manager_class = ThemeManager
+
+    create_theme = _write("create_theme")
+    update_theme = _write("update_theme")
+    delete_theme = _write("delete_theme")
+
+    get_theme = _read("get_theme")
+    get_all_themes = _read("get_all_themes")
+
+
+class AsyncStatsManager(_AsyncManager):
+    manager_class = StatsManager
+
+    update_stats = _write("update_stats")
+    update_card_probability = _write("update_card_probability")
+    record_answer = _write("record_answer")
+    record_answers = _write("record_answers")
+
+    get_card_stats = _read("get_card_stats")
+    get_reviews = _read("get_reviews")
+    get_stats = _read("get_stats")
+    get_stats_series = _read("get_stats_series")
+    get_stats_bounds = _read("get_stats_bounds")
+    get_theme_stats = _read("get_theme_stats")
+    get_theme_daily_stats = _read("get_theme_daily_stats")
+
+
+class AsyncSchedulerManager(_AsyncManager):
+    manager_class = SchedulerManager
+
+    review = _write("review")
+
+    get_due_cards = _read("get_due_cards")
+
+
+class AsyncGradingManager(_AsyncManager):
+    manager_class = GradingManager
+
+    grade = _read("grade")
+    grade_many = _read("grade_many")
+
+
+class AsyncDuplicateManager(_AsyncManager):
+    manager_class = DuplicateManager
+
+    dismiss = _write("dismiss")
+    reindex = _write("reindex")
+
+    get_duplicates = _read("get_duplicates")
+    find_duplicates = _read("find_duplicates")
+
+
+class AsyncUserManager(_AsyncManager):
+    manager_class = UserManager
+
+    def __init__(
+        self,
+        user_id,
+        db_name=DB_PATH,
+        executor=None,
+        shards=None,
+        mode="leitner",
+    ):
+        super().__init__(
+            executor=executor,
+            manager=UserManager(user_id, db_name, mode=mode, shards=shards),
+        )
+
+    record_answer = _write("record_answer")
+
+    get_card_weights_by_themes = _read("get_card_weights_by_themes")
+    draw_quiz = _read("draw_quiz")
+    get_due_cards = _read("get_due_cards")
+    get_card_state = _read("get_card_state")
+    get_stats = _read("get_stats")
+
+
+class AsyncFlashcardApp(_AsyncManager):
+    """
+    Façade asynchrone de FlashcardApp : tirage des quizz et enregistrement des
+    réponses, plus les gestionnaires asynchrones fm, tm, sm, scheduler, grader
+    et duplicates.
+    """
+
+    manager_class = FlashcardApp
+
+    def __init__(self, db_name=DB_PATH, executor=None, manager=None):
+        super().__init__(db_name, executor, manager)
+        app = self.manager
+        self.fm = AsyncFlashcardManager(executor=self.executor, manager=app.fm)
+        self.tm = AsyncThemeManager(executor=self.executor, manager=app.tm)
+        self.sm = AsyncStatsManager(executor=self.executor, manager=app.sm)
+        self.scheduler = AsyncSchedulerManager(
+            executor=self.executor, manager=app.scheduler
+        )
+        self.grader = AsyncGradingManager(executor=self.executor, manager=app.grader)
+        self.duplicates = AsyncDuplicateManager(
+            executor=self.executor, manager=app.duplicates
+        )
+
+    draw_quiz = _read("draw_quiz")
+    draw_due_quiz = _read("draw_due_quiz")
+    get_cards_by_themes = _read("get_cards_by_themes")
+    get_deck = _read("get_deck")
+
+    # Réponse, planification et échantillonneur : toujours sur le thread d'écriture
+    record_answer = _write("record_answer")
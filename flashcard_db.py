@@ -1,132 +1,1148 @@
+import atexit
+import csv
+import functools
+import heapq
+import io
+import json
+import logging
+import os
 import sqlite3
-import random
-from datetime import datetime
+import sys
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import answer_grading
+import card_dedup
+from card_sampler import FenwickSampler, sample_without_replacement
+from card_store import Card, Deck
+
+# Journalisation silencieuse par défaut : l'application choisit niveau et sortie
+# (ex. logging.basicConfig(level=logging.DEBUG) pour retrouver tous les messages)
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+# === Réglages appliqués à chaque connexion SQLite ===
+PRAGMAS = (
+    "PRAGMA foreign_keys = ON;",  # Active la vérification des clés étrangères
+    "PRAGMA journal_mode = WAL;",  # Lectures concurrentes pendant les écritures
+    "PRAGMA synchronous = NORMAL;",  # Suffisant en WAL, évite un fsync par commit
+    "PRAGMA cache_size = -16000;",  # Environ 16 Mo de cache de pages
+    "PRAGMA mmap_size = 268435456;",  # Lecture du fichier projetée en mémoire (256 Mo)
+    "PRAGMA temp_store = MEMORY;",
+)
+
+# Base par défaut : à côté du code (indépendante du répertoire courant),
+# ou désignée par la variable d'environnement FLASHCARDS_DB
+DB_PATH = os.environ.get(
+    "FLASHCARDS_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "flashcards.db"),
+)
+
+# Nombre maximal de paramètres liés par requête (limite basse des anciennes versions de SQLite)
+MAX_SQL_PARAMS = 500
+
+# Colonnes lues pour une carte (id, question, reponse, probabilite, id_theme) : la table
+# cards porte aussi les colonnes de planification, lues par SchedulerManager seulement
+CARD_COLUMNS = "id, question, reponse, probabilite, id_theme"
+
+
+# Incrément des statistiques du jour (s'appuie sur l'index unique stats(date))
+UPSERT_STATS = """
+    INSERT INTO stats (bonnes_reponses, mauvaises_reponses, date) VALUES (?, ?, ?)
+    ON CONFLICT(date) DO UPDATE SET
+    bonnes_reponses = bonnes_reponses + excluded.bonnes_reponses,
+    mauvaises_reponses = mauvaises_reponses + excluded.mauvaises_reponses
+"""
+
+# === Révision espacée ===
+FORMAT_REVISION = "%Y-%m-%d %H:%M:%S"  # Format des dates de prochaine révision
+REVISION_INITIALE = "1970-01-01 00:00:00"  # Carte jamais révisée : due immédiatement
+INTERVALLES_LEITNER = (1, 2, 4, 8, 16)  # Intervalle (jours) de chaque boîte de Leitner
+
+# État propre à chaque utilisateur : probabilité et planification des cartes qu'il a
+# déjà vues (les autres gardent les valeurs par défaut), et statistiques du jour.
+# Tables créées dans la base principale, ou dans chaque fichier de partition.
+USER_STATE_SCHEMA = (
+    f"""
+    CREATE TABLE IF NOT EXISTS user_cards (
+    user_id TEXT NOT NULL,
+    card_id INTEGER NOT NULL,
+    probabilite REAL NOT NULL,
+    prochaine_revision TEXT NOT NULL DEFAULT '{REVISION_INITIALE}',
+    boite INTEGER NOT NULL DEFAULT 1,
+    facilite REAL NOT NULL DEFAULT 2.5,
+    intervalle REAL NOT NULL DEFAULT 0,
+    repetitions INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, card_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_user_cards_due ON user_cards(user_id, prochaine_revision)",
+    """
+    CREATE TABLE IF NOT EXISTS user_stats (
+    user_id TEXT NOT NULL,
+    date DATE NOT NULL,
+    bonnes_reponses INTEGER NOT NULL DEFAULT 0,
+    mauvaises_reponses INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, date)
+    ) WITHOUT ROWID
+    """,
+)
+
+
+# === Règle de mise à jour de la probabilité d'une carte ===
+PROBA_INITIALE = 0.5  # Probabilité d'une carte à sa création
+FACTEUR_BONNE_REPONSE = 0.9
+FACTEUR_MAUVAISE_REPONSE = 1.1
+PROBA_MIN = 0.1
+PROBA_MAX = 1.0
+
+
+def fts_query(texte):
+    # Requête FTS5 à partir d'une saisie libre : chaque mot est cité (les caractères
+    # spéciaux de la syntaxe FTS5 ne sont pas interprétés) et le dernier est un
+    # préfixe, pour une recherche au fil de la frappe. Chaîne vide si rien à chercher.
+    mots = ['"' + mot.replace('"', '""') + '"' for mot in texte.split()]
+    if not mots:
+        return ""
+    mots[-1] += "*"
+    return " ".join(mots)
+
+
+def store_answers(conn, rows):
+    # Enregistre la forme normalisée des réponses (card_id, reponse) pour la correction
+    conn.executemany(
+        "INSERT OR REPLACE INTO card_answers (card_id, normalisee, mots) VALUES (?, ?, ?)",
+        ((card_id, *answer_grading.prepare(reponse)) for card_id, reponse in rows),
+    )
+
+
+# Candidates lues au plus par clé LSH : sur un paquet construit sur un modèle
+# (« Traduction du mot numéro {i} »), une même clé regroupe des milliers de cartes
+MAX_CANDIDATS_CLE = 20
+
+# Cartes indexées par transaction (import, réindexation, migration 9) : environ 0,3 s
+# de verrou d'écriture et quelques dizaines de Mo par paquet de cartes de 300 caractères
+INDEX_CHUNK = 1000
+
+# Candidates d'une carte : les cartes les plus récentes de chacune de ses clés
+_CANDIDATS_SQL = " UNION ".join(
+    [
+        "SELECT * FROM (SELECT card_id FROM card_lsh WHERE bande = ? AND cle = ? "
+        "ORDER BY card_id DESC LIMIT ?)"
+    ]
+    * card_dedup.NB_BANDES
+)
+
+
+def index_duplicates(conn, rows, seuil=card_dedup.SEUIL_DOUBLON):
+    # Indexe les cartes (card_id, question, reponse) dans card_lsh et signale dans
+    # card_duplicates, pour chacune, la carte déjà indexée la plus proche. Les candidates
+    # sont lues par clé LSH (au plus MAX_CANDIDATS_CLE par clé, en une requête, plus
+    # les cartes précédentes du lot), leur texte en une requête, puis leur similarité
+    # est calculée exactement. Renvoie les paires signalées (card_id, doublon_id, similarite).
+    ensembles = {
+        card_id: card_dedup.shingles(question, reponse)
+        for card_id, question, reponse in rows
+    }
+    toutes_cles = card_dedup.band_keys_many(list(ensembles.values()))
+    doublons = []
+    lot = {}  # Clé LSH -> cartes du lot déjà traitées (insérées en fin de lot)
+    for (card_id, ensemble), cles in zip(list(ensembles.items()), toutes_cles):
+        if len(cles) != card_dedup.NB_BANDES:
+            continue  # Carte sans texte : ni clé, ni doublon
+        params = []
+        for bande, cle in cles:
+            params += [bande, cle, MAX_CANDIDATS_CLE]
+        candidates = {
+            autre_id
+            for (autre_id,) in conn.execute(_CANDIDATS_SQL, params)
+            if autre_id != card_id
+        }
+        for cle in cles:
+            candidates.update(lot.get(cle, ())[-MAX_CANDIDATS_CLE:])
+            lot.setdefault(cle, []).append(card_id)
+        inconnues = [autre_id for autre_id in candidates if autre_id not in ensembles]
+        if inconnues:
+            placeholders = ", ".join("?" * len(inconnues))
+            for autre_id, question, reponse in conn.execute(
+                f"SELECT id, question, reponse FROM cards WHERE id IN ({placeholders})",
+                inconnues,
+            ):
+                ensembles[autre_id] = card_dedup.shingles(question, reponse)
+        meilleure = max(
+            (
+                (card_dedup.jaccard(ensemble, ensembles[autre_id]), autre_id)
+                for autre_id in candidates
+                if autre_id in ensembles
+            ),
+            default=None,
+        )
+        if meilleure is not None and meilleure[0] >= seuil:
+            doublons.append((card_id, meilleure[1], round(meilleure[0], 3)))
+    conn.executemany(
+        "INSERT OR IGNORE INTO card_lsh (bande, cle, card_id) VALUES (?, ?, ?)",
+        (
+            (bande, cle, card_id)
+            for (bande, cle), card_ids in lot.items()
+            for card_id in card_ids
+        ),
+    )
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO card_duplicates (card_id, doublon_id, similarite)
+        VALUES (?, ?, ?)
+        """,
+        doublons,
+    )
+    return doublons
+
+
+def next_probability(proba, is_correct):
+    # Nouvelle probabilité après une réponse, encadrée entre PROBA_MIN et PROBA_MAX
+    facteur = FACTEUR_BONNE_REPONSE if is_correct else FACTEUR_MAUVAISE_REPONSE
+    return max(PROBA_MIN, min(proba * facteur, PROBA_MAX))
+
+
+class Instrumentation:
+    """
+    Mesures par méthode des gestionnaires : nombre d'appels, durée, lignes renvoyées
+    et requêtes SQL exécutées. Désactivée par défaut (coût quasi nul) ; s'active avec
+    instrumentation.enable() ou la variable d'environnement FLASHCARDS_INSTRUMENTATION=1.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {}
+        self._callbacks = []
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def add_callback(self, callback):
+        # callback(name, duration, rows, statements) est appelé après chaque appel mesuré
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        self._callbacks.remove(callback)
+
+    def count_statement(self, statement):
+        # Branché comme trace_callback sur les connexions empruntées
+        self._local.statements = getattr(self._local, "statements", 0) + 1
+
+    def statements(self):
+        return getattr(self._local, "statements", 0)
+
+    def record(self, name, duration, rows, statements):
+        with self._lock:
+            s = self._stats.setdefault(
+                name,
+                {"calls": 0, "total_s": 0.0, "max_s": 0.0, "rows": 0, "statements": 0},
+            )
+            s["calls"] += 1
+            s["total_s"] += duration
+            s["max_s"] = max(s["max_s"], duration)
+            s["rows"] += rows
+            s["statements"] += statements
+        for callback in list(self._callbacks):
+            callback(name, duration, rows, statements)
+
+    def report(self):
+        # Copie des mesures agrégées, avec la durée moyenne par appel
+        with self._lock:
+            report = {name: dict(s) for name, s in self._stats.items()}
+        for s in report.values():
+            s["mean_s"] = s["total_s"] / s["calls"]
+        return report
+
+    def dump(self, file=None):
+        # Écrit le rapport en JSON (sur la sortie standard par défaut)
+        json.dump(self.report(), file or sys.stdout, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+instrumentation = Instrumentation(
+    enabled=os.environ.get("FLASHCARDS_INSTRUMENTATION") == "1"
+)
+
+
+def instrumented(method):
+    # Décorateur des méthodes des gestionnaires : mesure durée, lignes et requêtes
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if not instrumentation.enabled:
+            return method(*args, **kwargs)
+        statements = instrumentation.statements()
+        debut = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - debut
+        rows = len(result) if isinstance(result, list) else int(result is not None)
+        instrumentation.record(
+            method.__qualname__,
+            duration,
+            rows,
+            instrumentation.statements() - statements,
+        )
+        return result
+
+    return wrapper
+
+
+class ReadCache:
+    """
+    Cache LRU borné des lectures des gestionnaires, partagé entre les reruns Streamlit.
+    Chaque entrée mémorise la version des données au moment de la lecture : toute
+    écriture validée, via transaction() ou par un autre processus, change cette version
+    et rend les entrées existantes obsolètes. Les valeurs mémorisées sont partagées :
+    listes de tuples ou de Card, non modifiables.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        # Renvoie (trouvé, valeur) pour la version de données demandée
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[1]
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)  # Éviction de la plus ancienne
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def cached_read(method):
+    # Décorateur des lectures : résultat mémorisé jusqu'à la prochaine écriture
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        pool = self.pool
+        key = (method.__qualname__, args, tuple(sorted(kwargs.items())))
+        version = pool.version()
+        trouve, value = pool.cache.get(key, version)
+        if not trouve:
+            value = method(self, *args, **kwargs)
+            if value is None:
+                return None  # Erreur ou absence : rien à mémoriser
+            pool.cache.put(key, version, value)
+        # Copie de la liste : l'appelant peut la modifier sans altérer le cache
+        return list(value) if isinstance(value, list) else value
+
+    return wrapper
+
+
+class ConnectionPool:
+    """
+    Réserve de connexions SQLite partagée par tous les gestionnaires d'un même fichier.
+    Les connexions sont ouvertes et configurées une seule fois, puis réutilisées
+    d'un appel à l'autre (et d'un rerun Streamlit à l'autre).
+    """
+
+    def __init__(self, db_name, max_size=8, cached_statements=256, attach=()):
+        self.db_name = db_name
+        self.max_size = max_size  # Nombre maximal de connexions inactives conservées
+        self.cached_statements = cached_statements
+        self.attach = tuple(
+            attach
+        )  # Bases rattachées en lecture seule : (alias, fichier)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.data_version = 0  # Incrémenté à chaque transaction qui modifie la base
+        self.cache = ReadCache()
+        self._watch = None  # Connexion dédiée à la détection des écritures externes
+        self._watch_lock = threading.Lock()
+
+    def open(self):
+        # Ouvre une nouvelle connexion configurée avec les PRAGMAS
+        conn = sqlite3.connect(
+            self.db_name,
+            check_same_thread=False,  # Une connexion peut changer de thread entre deux emprunts
+            cached_statements=self.cached_statements,
+            uri=bool(self.attach),
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        for alias, fichier in self.attach:
+            # Lecture seule : une écriture ici ne verrouille jamais le fichier rattaché
+            conn.execute(
+                f"ATTACH DATABASE ? AS {alias}",
+                (f"file:{urllib.parse.quote(os.path.abspath(fichier))}?mode=ro",),
+            )
+        logger.debug("Connexion à la base de données réussie")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        # Un thread qui détient déjà une connexion la réutilise (appels imbriqués)
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            yield held
+            return
+
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self.open()
+        # Comptage des requêtes uniquement si l'instrumentation est active
+        conn.set_trace_callback(
+            instrumentation.count_statement if instrumentation.enabled else None
+        )
+
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            # Ne jamais rendre à la réserve une connexion avec une transaction ouverte
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                if len(self._idle) < self.max_size:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    @contextmanager
+    def transaction(self):
+        # Valide à la sortie du bloc, annule en cas d'exception.
+        # Les transactions imbriquées sont fusionnées dans la plus externe.
+        with self.connection() as conn:
+            depth = getattr(self._local, "depth", 0)
+            if depth == 0 and not conn.in_transaction:
+                # Prend le verrou d'écriture dès le début (y compris pour le DDL)
+                conn.execute("BEGIN IMMEDIATE")
+            self._local.depth = depth + 1
+            changes = conn.total_changes
+            try:
+                yield conn
+            except BaseException:
+                if depth == 0 and conn.in_transaction:
+                    conn.rollback()
+                raise
+            else:
+                if depth == 0:
+                    conn.commit()
+                    if conn.total_changes != changes:
+                        # Les lectures mises en cache deviennent obsolètes
+                        with self._lock:
+                            self.data_version += 1
+            finally:
+                self._local.depth = depth
+
+    def version(self):
+        # Version des données pour le cache de lecture : transactions de cette réserve
+        # et PRAGMA data_version d'une connexion dédiée, qui change dès qu'une autre
+        # connexion (autre processus compris) valide une écriture dans le fichier
+        with self._watch_lock:
+            if self._watch is None:
+                self._watch = self.open()
+            externe = self._watch.execute("PRAGMA data_version").fetchone()[0]
+        return self.data_version, externe
+
+    def close_all(self):
+        # Ferme les connexions inactives de la réserve
+        with self._lock:
+            idle, self._idle = self._idle, []
+        with self._watch_lock:
+            if self._watch is not None:
+                idle.append(self._watch)
+                self._watch = None
+        for conn in idle:
+            conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_name, attach=()):
+    # Une seule réserve par fichier de base, partagée par tous les gestionnaires
+    key = os.path.abspath(db_name)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(db_name, attach=attach)
+        return _pools[key]
+
+
+@atexit.register
+def _close_pools():
+    for pool in list(_pools.values()):
+        pool.close_all()
+
+
+# === Migrations du schéma ===
+# Nombre de clés de la table source traitées par transaction lors d'une reprise de données
+BACKFILL_CHUNK = 50000
+
+
+class Migration:
+    """
+    Évolution du schéma vers une version donnée. apply(conn) s'exécute dans une
+    transaction qui fixe aussi PRAGMA user_version : la migration est appliquée
+    entièrement ou pas du tout.
+    Une reprise de données sur une grande table se déclare avec backfill(conn, debut, fin)
+    et source (nom de la table) : elle est appliquée ensuite par tranches de clés
+    ]debut, fin] de source, chacune dans sa propre transaction. Le verrou d'écriture
+    est relâché entre deux tranches et la reprise continue après une interruption.
+    Seules les lignes présentes lors de la migration sont reprises : les suivantes
+    sont à la charge des triggers créés par apply. chunk_size borne les tranches d'une
+    reprise coûteuse par ligne (BACKFILL_CHUNK clés par défaut).
+    """
+
+    def __init__(
+        self, version, description, apply, backfill=None, source=None, chunk_size=None
+    ):
+        self.version = version
+        self.description = description
+        self.apply = apply
+        self.backfill = backfill
+        self.source = source
+        self.chunk_size = chunk_size
+
+
+def _migration_1(conn):
+    # Fusionne les éventuels doublons de date avant la contrainte d'unicité
+    conn.execute(
+        """
+        UPDATE stats SET
+        bonnes_reponses = (SELECT SUM(s.bonnes_reponses) FROM stats s WHERE s.date = stats.date),
+        mauvaises_reponses = (SELECT SUM(s.mauvaises_reponses) FROM stats s WHERE s.date = stats.date)
+        WHERE id IN (SELECT MIN(id) FROM stats GROUP BY date HAVING COUNT(*) > 1)
+        """
+    )
+    conn.execute(
+        "DELETE FROM stats WHERE id NOT IN (SELECT MIN(id) FROM stats GROUP BY date)"
+    )
+    # Une seule ligne par jour : les statistiques deviennent un UPSERT
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_stats_date ON stats(date)")
+    # Index couvrant pour le tirage par thème (id, id_theme, probabilite)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_cards_theme_proba ON cards(id_theme, probabilite)"
+    )
+
+
+def _migration_2(conn):
+    # État de révision espacée de chaque carte. Les cartes existantes et
+    # nouvelles sont dues immédiatement (date de révision par défaut en 1970).
+    for colonne in (
+        f"prochaine_revision TEXT NOT NULL DEFAULT '{REVISION_INITIALE}'",
+        "boite INTEGER NOT NULL DEFAULT 1",
+        "facilite REAL NOT NULL DEFAULT 2.5",
+        "intervalle REAL NOT NULL DEFAULT 0",
+        "repetitions INTEGER NOT NULL DEFAULT 0",
+    ):
+        conn.execute(f"ALTER TABLE cards ADD COLUMN {colonne}")
+    # File des cartes dues : parcours d'index par thème et par échéance
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_cards_theme_due ON cards(id_theme, prochaine_revision)"
+    )
+
+
+def _migration_3(conn):
+    # Journal des révisions, en ajout seul (conservé si la carte est supprimée)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS reviews (
+        id INTEGER PRIMARY KEY,
+        card_id INTEGER NOT NULL,
+        id_theme INTEGER,
+        correct INTEGER NOT NULL,
+        date_revision TEXT NOT NULL,
+        temps_reponse REAL
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_reviews_card ON reviews(card_id, date_revision)"
+    )
+    # Cumul par carte, dérivé du journal
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS card_stats (
+        card_id INTEGER PRIMARY KEY REFERENCES cards(id) ON DELETE CASCADE,
+        bonnes_reponses INTEGER NOT NULL DEFAULT 0,
+        mauvaises_reponses INTEGER NOT NULL DEFAULT 0,
+        derniere_revision TEXT
+        )
+        """
+    )
+    # Chaque révision ajoutée incrémente les statistiques du jour et de la carte
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS reviews_aggregats AFTER INSERT ON reviews
+        BEGIN
+            INSERT INTO stats (bonnes_reponses, mauvaises_reponses, date)
+            VALUES (NEW.correct, 1 - NEW.correct, date(NEW.date_revision))
+            ON CONFLICT(date) DO UPDATE SET
+            bonnes_reponses = bonnes_reponses + excluded.bonnes_reponses,
+            mauvaises_reponses = mauvaises_reponses + excluded.mauvaises_reponses;
+
+            INSERT INTO card_stats
+            (card_id, bonnes_reponses, mauvaises_reponses, derniere_revision)
+            VALUES (NEW.card_id, NEW.correct, 1 - NEW.correct, NEW.date_revision)
+            ON CONFLICT(card_id) DO UPDATE SET
+            bonnes_reponses = bonnes_reponses + excluded.bonnes_reponses,
+            mauvaises_reponses = mauvaises_reponses + excluded.mauvaises_reponses,
+            derniere_revision = excluded.derniere_revision;
+        END
+        """
+    )
+
+
+def _migration_4(conn):
+    # Cumuls par thème (toutes dates confondues) et par thème et par jour
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS theme_stats (
+        id_theme INTEGER PRIMARY KEY REFERENCES themes(id_theme) ON DELETE CASCADE,
+        bonnes_reponses INTEGER NOT NULL DEFAULT 0,
+        mauvaises_reponses INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS theme_stats_jour (
+        id_theme INTEGER NOT NULL REFERENCES themes(id_theme) ON DELETE CASCADE,
+        date DATE NOT NULL,
+        bonnes_reponses INTEGER NOT NULL DEFAULT 0,
+        mauvaises_reponses INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (id_theme, date)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_theme_stats_jour_date ON theme_stats_jour(date)"
+    )
+    # Chaque révision d'une carte rattachée à un thème incrémente ses cumuls
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS reviews_aggregats_theme AFTER INSERT ON reviews
+        WHEN NEW.id_theme IS NOT NULL
+        BEGIN
+            INSERT INTO theme_stats (id_theme, bonnes_reponses, mauvaises_reponses)
+            VALUES (NEW.id_theme, NEW.correct, 1 - NEW.correct)
+            ON CONFLICT(id_theme) DO UPDATE SET
+            bonnes_reponses = bonnes_reponses + excluded.bonnes_reponses,
+            mauvaises_reponses = mauvaises_reponses + excluded.mauvaises_reponses;
+
+            INSERT INTO theme_stats_jour
+            (id_theme, date, bonnes_reponses, mauvaises_reponses)
+            VALUES (NEW.id_theme, date(NEW.date_revision), NEW.correct, 1 - NEW.correct)
+            ON CONFLICT(id_theme, date) DO UPDATE SET
+            bonnes_reponses = bonnes_reponses + excluded.bonnes_reponses,
+            mauvaises_reponses = mauvaises_reponses + excluded.mauvaises_reponses;
+        END
+        """
+    )
+
+
+def _migration_5(conn):
+    # Pagination par thème : entrées triées par (id_theme, id)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cards_theme_id ON cards(id_theme)")
+
+
+def _migration_6(conn):
+    # Index plein texte sur les questions et réponses. La table virtuelle
+    # ne stocke que l'index : le texte reste dans cards (content='cards').
+    conn.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5(
+        question, reponse, content='cards', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    conn.execute("INSERT INTO cards_fts(cards_fts) VALUES ('rebuild')")
+    # Synchronisation par triggers ; la mise à jour de la probabilité ou
+    # de la planification ne touche pas à l'index
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS cards_fts_insert AFTER INSERT ON cards
+        BEGIN
+            INSERT INTO cards_fts (rowid, question, reponse)
+            VALUES (NEW.id, NEW.question, NEW.reponse);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS cards_fts_delete AFTER DELETE ON cards
+        BEGIN
+            INSERT INTO cards_fts (cards_fts, rowid, question, reponse)
+            VALUES ('delete', OLD.id, OLD.question, OLD.reponse);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS cards_fts_update
+        AFTER UPDATE OF question, reponse ON cards
+        BEGIN
+            INSERT INTO cards_fts (cards_fts, rowid, question, reponse)
+            VALUES ('delete', OLD.id, OLD.question, OLD.reponse);
+            INSERT INTO cards_fts (rowid, question, reponse)
+            VALUES (NEW.id, NEW.question, NEW.reponse);
+        END
+        """
+    )
+
+
+def _migration_7(conn):
+    # État et statistiques par utilisateur (base non partitionnée)
+    for ddl in USER_STATE_SCHEMA:
+        conn.execute(ddl)
+
+
+def _migration_8(conn):
+    # Réponses attendues normalisées, calculées à l'écriture des cartes
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS card_answers (
+        card_id INTEGER PRIMARY KEY REFERENCES cards(id) ON DELETE CASCADE,
+        normalisee TEXT NOT NULL,
+        mots TEXT NOT NULL
+        )
+        """
+    )
+    # Une réponse modifiée hors de FlashcardManager n'a plus de forme normalisée :
+    # elle est alors recalculée à la correction
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS cards_answers_update AFTER UPDATE OF reponse ON cards
+        BEGIN
+            DELETE FROM card_answers WHERE card_id = NEW.id;
+        END
+        """
+    )
+
+
+def _migration_9(conn):
+    # Index LSH des cartes (clés MinHash par bande) et paires signalées comme doublons
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS card_lsh (
+        bande INTEGER NOT NULL,
+        cle INTEGER NOT NULL,
+        card_id INTEGER NOT NULL REFERENCES cards(id) ON DELETE CASCADE,
+        PRIMARY KEY (bande, cle, card_id)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_card_lsh_card ON card_lsh(card_id)")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS card_duplicates (
+        card_id INTEGER NOT NULL REFERENCES cards(id) ON DELETE CASCADE,
+        doublon_id INTEGER NOT NULL REFERENCES cards(id) ON DELETE CASCADE,
+        similarite REAL NOT NULL,
+        PRIMARY KEY (card_id, doublon_id)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_card_duplicates_doublon ON card_duplicates(doublon_id)"
+    )
+    # Une carte modifiée perd ses clés et ses signalements : FlashcardManager la
+    # réindexe aussitôt, DuplicateManager.reindex rattrape les modifications faites
+    # hors de l'application
+    conn.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS cards_lsh_update AFTER UPDATE OF question, reponse ON cards
+        BEGIN
+            DELETE FROM card_lsh WHERE card_id = NEW.id;
+            DELETE FROM card_duplicates WHERE card_id = NEW.id OR doublon_id = NEW.id;
+        END
+        """
+    )
+
+
+def _migration_10(conn):
+    # Les mots de négation ne sont plus des mots vides : seuls les mots précalculés
+    # des réponses changent, recalculés par la reprise de la migration 8. Une reprise
+    # de la migration 8 encore en attente (mise à niveau depuis la version 7 ou avant)
+    # est remplacée par celle-ci, qui couvre toutes les cartes
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_backfills'"
+    ).fetchone():
+        conn.execute("DELETE FROM schema_backfills WHERE version = 8")
+
+
+def _backfill_4(conn, debut, fin):
+    # Reprise des révisions déjà journalisées (ids ]debut, fin]) dans les cumuls par thème
+    conn.execute(
+        """
+        INSERT INTO theme_stats (id_theme, bonnes_reponses, mauvaises_reponses)
+        SELECT r.id_theme, SUM(r.correct), SUM(1 - r.correct) FROM reviews r
+        JOIN themes t ON t.id_theme = r.id_theme
+        WHERE r.id > ? AND r.id <= ? GROUP BY r.id_theme
+        ON CONFLICT(id_theme) DO UPDATE SET
+        bonnes_reponses = bonnes_reponses + excluded.bonnes_reponses,
+        mauvaises_reponses = mauvaises_reponses + excluded.mauvaises_reponses
+        """,
+        (debut, fin),
+    )
+    conn.execute(
+        """
+        INSERT INTO theme_stats_jour (id_theme, date, bonnes_reponses, mauvaises_reponses)
+        SELECT r.id_theme, date(r.date_revision), SUM(r.correct), SUM(1 - r.correct)
+        FROM reviews r JOIN themes t ON t.id_theme = r.id_theme
+        WHERE r.id > ? AND r.id <= ? GROUP BY r.id_theme, date(r.date_revision)
+        ON CONFLICT(id_theme, date) DO UPDATE SET
+        bonnes_reponses = bonnes_reponses + excluded.bonnes_reponses,
+        mauvaises_reponses = mauvaises_reponses + excluded.mauvaises_reponses
+        """,
+        (debut, fin),
+    )
+
+
+def _backfill_8(conn, debut, fin):
+    # Normalisation des réponses des cartes d'ids ]debut, fin]
+    store_answers(
+        conn,
+        conn.execute(
+            "SELECT id, reponse FROM cards WHERE id > ? AND id <= ?", (debut, fin)
+        ).fetchall(),
+    )
+
+
+def _backfill_9(conn, debut, fin):
+    # Indexation des cartes d'ids ]debut, fin], chacune comparée aux précédentes
+    index_duplicates(
+        conn,
+        conn.execute(
+            "SELECT id, question, reponse FROM cards WHERE id > ? AND id <= ? ORDER BY id",
+            (debut, fin),
+        ).fetchall(),
+    )
+
+
+# Migrations dans l'ordre des versions. Pour faire évoluer le schéma : ajouter une
+# fonction _migration_N et son entrée ici, jamais modifier une migration publiée.
+MIGRATIONS = (
+    Migration(
+        1, "Statistiques : une ligne par jour ; index de tirage par thème", _migration_1
+    ),
+    Migration(2, "Révision espacée : planification de chaque carte", _migration_2),
+    Migration(3, "Journal des révisions et cumuls par carte", _migration_3),
+    Migration(
+        4,
+        "Cumuls par thème, et par thème et par jour",
+        _migration_4,
+        backfill=_backfill_4,
+        source="reviews",
+    ),
+    Migration(5, "Index de pagination des cartes par thème", _migration_5),
+    Migration(
+        6, "Recherche plein texte (FTS5) dans les questions et réponses", _migration_6
+    ),
+    Migration(7, "État et statistiques par utilisateur", _migration_7),
+    Migration(
+        8,
+        "Réponses normalisées pour la correction automatique",
+        _migration_8,
+        backfill=_backfill_8,
+        source="cards",
+    ),
+    Migration(
+        9,
+        "Détection des cartes presque identiques (MinHash et LSH)",
+        _migration_9,
+        backfill=_backfill_9,
+        source="cards",
+        chunk_size=INDEX_CHUNK,
+    ),
+    Migration(
+        10,
+        "Réponses normalisées : mots de négation conservés",
+        _migration_10,
+        backfill=_backfill_8,
+        source="cards",
+    ),
+)
+
+# Version du schéma attendue par le code (stockée dans PRAGMA user_version)
+SCHEMA_VERSION = MIGRATIONS[-1].version
 
 
 class Database:
     # === Initialisation d'une nouvelle instance de Database ===
-    def __init__(self, db_name="flashcards.db"):
+    def __init__(self, db_name=DB_PATH):
         self.db_name = db_name  # Stocke le nom de la base comme attribut d’objet
+        self.pool = get_pool(db_name)  # Réserve de connexions partagée
 
     # === Connection à la base ===
     def connect(self):
-        # Créer une connexion à la base de données
-        conn = sqlite3.connect(self.db_name)
-        print("Connexion à la base de données réussie")
-        # Active la vérification des clés étrangères
-        conn.execute("PRAGMA foreign_keys = ON;")
-        return conn
+        # Ouvre une connexion dédiée, configurée comme celles de la réserve
+        # (à fermer par l'appelant). Les gestionnaires utilisent connection()/transaction().
+        return self.pool.open()
+
+    def connection(self):
+        # Emprunte une connexion à la réserve le temps d'un bloc "with"
+        return self.pool.connection()
+
+    def transaction(self):
+        # Emprunte une connexion et valide (ou annule) la transaction à la sortie du bloc
+        return self.pool.transaction()
 
     # === Création des tables et insertion des thèmes ===
     def init_db(self):
-        # Créer une connexion à la base de données
-        conn = self.connect()
-        # Créer un curseur pour exécuter les requêtes SQL
-        cursor = conn.cursor()
+        with self.transaction() as conn:
+            # Créer un curseur pour exécuter les requêtes SQL
+            cursor = conn.cursor()
+
+            # Création des tables
+            cursor.execute(
+                """
+            CREATE TABLE IF NOT EXISTS cards (
+            id INTEGER PRIMARY KEY,
+            question TEXT,
+            reponse TEXT,
+            probabilite REAL,
+            id_theme INTEGER, FOREIGN KEY (id_theme) REFERENCES themes(id_theme) ON DELETE RESTRICT
+            );
+            """
+            )
 
-        # Création des tables
-        cursor.execute(
+            cursor.execute(
+                """
+            CREATE TABLE IF NOT EXISTS themes (
+            id_theme INTEGER PRIMARY KEY,
+            theme TEXT
+            );
             """
-        CREATE TABLE IF NOT EXISTS cards (
-        id INTEGER PRIMARY KEY,
-        question TEXT,
-        reponse TEXT,
-        probabilite REAL,
-        id_theme INTEGER, FOREIGN KEY (id_theme) REFERENCES themes(id_theme) ON DELETE RESTRICT
-        );
-        """
-        )
+            )
 
-        cursor.execute(
+            cursor.execute(
+                """
+            CREATE TABLE IF NOT EXISTS stats (
+            id INTEGER PRIMARY KEY,
+            bonnes_reponses INTEGER,
+            mauvaises_reponses INTEGER,
+            date DATE
+            );
             """
-        CREATE TABLE IF NOT EXISTS themes (
-        id_theme INTEGER PRIMARY KEY,
-        theme TEXT
-        );
-        """
-        )
+            )
 
-        cursor.execute(
+            # Insertion des thèmes dans la table "themes"
+            cursor.executemany(
+                "INSERT OR IGNORE INTO themes (id_theme, theme) VALUES (?, ?)",
+                [
+                    (1, "SQL"),
+                    (2, "Python et Pandas"),
+                    (3, "Machine Learning"),
+                    (4, "Visualisation de données"),
+                ],
+            )
+
+        # Les modifications sont validées à la sortie du bloc transaction
+        logger.info("Tables créées avec succès")
+        self.upgrade_schema()
+
+    # === Mise à niveau du schéma d'une base existante ===
+    def upgrade_schema(self, chunk_size=BACKFILL_CHUNK):
+        # Applique dans l'ordre les migrations manquantes (repérées par PRAGMA
+        # user_version), chacune dans sa transaction, puis les reprises de données
+        # en attente, par tranches
+        with self.connection() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            logger.warning(
+                "⚠️ Base en version %s, plus récente que le code (%s).",
+                version,
+                SCHEMA_VERSION,
+            )
+        depart = version
+
+        for migration in MIGRATIONS:
+            if migration.version <= version:
+                continue
+            with self.transaction() as conn:
+                # Relue sous le verrou : un autre processus a pu migrer entre-temps
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if migration.version <= version:
+                    continue
+                migration.apply(conn)
+                if migration.backfill is not None:
+                    self._schedule_backfill(conn, migration)
+                conn.execute(f"PRAGMA user_version = {migration.version}")
+                version = migration.version
+            logger.info(
+                "Migration %s appliquée : %s", migration.version, migration.description
+            )
+
+        if version != depart:
+            logger.info("Schéma mis à niveau (version %s → %s)", depart, version)
+        self._run_backfills(chunk_size)
+
+    @staticmethod
+    def _schedule_backfill(conn, migration):
+        # Note la reprise à faire : clés de la table source jusqu'à la plus grande actuelle
+        fin = conn.execute(
+            f"SELECT COALESCE(MAX(rowid), 0) FROM {migration.source}"
+        ).fetchone()[0]
+        if fin == 0:
+            return  # Table vide : rien à reprendre
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_backfills (
+            version INTEGER PRIMARY KEY,
+            position INTEGER NOT NULL,
+            fin INTEGER NOT NULL
+            )
             """
-        CREATE TABLE IF NOT EXISTS stats (
-        id INTEGER PRIMARY KEY,
-        bonnes_reponses INTEGER,
-        mauvaises_reponses INTEGER,
-        date DATE
-        );
-        """
         )
-
-        # Insertion des thèmes dans la table "themes"
-        cursor.executemany(
-            "INSERT OR IGNORE INTO themes (id_theme, theme) VALUES (?, ?)",
-            [
-                (1, "SQL"),
-                (2, "Python et Pandas"),
-                (3, "Machine Learning"),
-                (4, "Visualisation de données"),
-            ],
+        conn.execute(
+            "INSERT INTO schema_backfills (version, position, fin) VALUES (?, 0, ?)",
+            (migration.version, fin),
         )
 
-        # Valider les modifications et fermer la connexion avec la base
-        conn.commit()
-        conn.close()
-        print("Tables créées avec succès")
+    def _run_backfills(self, chunk_size):
+        # Reprises en attente, une tranche de chunk_size clés par transaction
+        with self.connection() as conn:
+            if (
+                conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_backfills'"
+                ).fetchone()
+                is None
+            ):
+                return
+        migrations = {migration.version: migration for migration in MIGRATIONS}
+        while True:
+            with self.transaction() as conn:
+                row = conn.execute(
+                    "SELECT version, position, fin FROM schema_backfills ORDER BY version LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return
+                version, position, fin = row
+                taille = min(chunk_size, migrations[version].chunk_size or chunk_size)
+                suivante = min(position + taille, fin)
+                migrations[version].backfill(conn, position, suivante)
+                if suivante >= fin:
+                    conn.execute(
+                        "DELETE FROM schema_backfills WHERE version = ?", (version,)
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE schema_backfills SET position = ? WHERE version = ?",
+                        (suivante, version),
+                    )
+            logger.info("Reprise de la migration %s : %s / %s", version, suivante, fin)
+
+
+_schemas_verifies = set()
+_schemas_verifies_lock = threading.Lock()
+
+
+def ensure_schema(db_name=DB_PATH):
+    # Crée ou met à niveau la base si besoin, une seule fois par processus et par
+    # fichier : les appels suivants ne touchent pas à la base
+    key = os.path.abspath(db_name)
+    if key in _schemas_verifies:
+        return
+    with _schemas_verifies_lock:
+        if key in _schemas_verifies:
+            return
+        db = Database(db_name)
+        with db.connection() as conn:
+            existe = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cards'"
+            ).fetchone()
+        if existe is None:
+            logger.info("Base de données non trouvée. Initialisation...")
+            db.init_db()
+        else:
+            # Migrations manquantes et reprises de données interrompues
+            db.upgrade_schema()
+        _schemas_verifies.add(key)
 
 
 class FlashcardManager(Database):
     # la classe FlashcardManager hérite de la classe Database
     # === Fonctions CRUD pour les Flashcards ===
+    @instrumented
     def create_card(self, question, reponse, id_theme):
         # Créer une carte
         try:
-            conn = self.connect()
-            c = conn.cursor()
-            probabilite = 0.5  # Probabilité fixée à 0.5 à la création de la carte
-            c.execute(
-                """
-                INSERT INTO cards (question, reponse, probabilite, id_theme)
-                VALUES (?, ?, ?, ?)
-            """,
-                (question, reponse, probabilite, id_theme),
-            )
-            conn.commit()
-            print("✅ Carte crée avec succès.")
+            with self.transaction() as conn:
+                c = conn.cursor()
+                probabilite = PROBA_INITIALE
+                c.execute(
+                    """
+                    INSERT INTO cards (question, reponse, probabilite, id_theme)
+                    VALUES (?, ?, ?, ?)
+                """,
+                    (question, reponse, probabilite, id_theme),
+                )
+                store_answers(conn, [(c.lastrowid, reponse)])
+                doublons = index_duplicates(conn, [(c.lastrowid, question, reponse)])
+            for card_id, doublon_id, similarite in doublons:
+                logger.warning(
+                    "⚠️ Carte %s proche de la carte %s (similarité %.2f).",
+                    card_id,
+                    doublon_id,
+                    similarite,
+                )
+            logger.debug("✅ Carte crée avec succès.")
 
         except sqlite3.Error as e:
-            print(f"❌ Erreur lors de la création de la carte : {e}")
-
-        finally:
-            conn.close()
+            logger.error("❌ Erreur lors de la création de la carte : %s", e)
 
+    @instrumented
+    @cached_read
     def get_card(self, id):
         # Récupérer une carte
         try:
-            conn = self.connect()
-            c = conn.cursor()
-            c.execute("SELECT * FROM cards WHERE id = ?", (id,))
-            result = c.fetchone()
+            with self.connection() as conn:
+                c = conn.cursor()
+                c.execute(f"SELECT {CARD_COLUMNS} FROM cards WHERE id = ?", (id,))
+                result = c.fetchone()
             if result is None:
                 raise ValueError(f"⚠️ Carte avec l'id {id} introuvable.")
             else:
-                print(f"✅ Carte avec l'id {id} récupérée avec succès.")
-            return result
+                logger.debug("✅ Carte avec l'id %s récupérée avec succès.", id)
+            return Card.from_row(result)
 
         except sqlite3.Error as e:
-            print(f"❌ Erreur lors de la récupération de la carte : {e}")
+            logger.error("❌ Erreur lors de la récupération de la carte : %s", e)
             return None
 
-        finally:
-            conn.close()
-
+    @instrumented
     def update_card(
         self, id, question=None, reponse=None, probabilite=None, id_theme=None
     ):
         # Mise à jour d'une carte
         try:
-            conn = self.connect()
-            c = conn.cursor()
-
             # Dictionnaire des champs à mettre à jour
             fields = {
                 "question": question,
@@ -138,7 +1154,7 @@ class FlashcardManager(Database):
             updates = {k: v for k, v in fields.items() if v is not None}
 
             if not updates:
-                print("⚠️ Aucun champ à mettre à jour.")
+                logger.info("⚠️ Aucun champ à mettre à jour.")
                 return
 
             # Vérification de la probabilité si fournie
@@ -153,169 +1169,356 @@ class FlashcardManager(Database):
             values = list(updates.values()) + [id]
 
             query = f"UPDATE cards SET {set_clause} WHERE id = ?"
-            c.execute(query, values)
-            # Si on modifie par exemple les champs reponse et probabilite, on obtient quelque chose équivalent à :
-            # c.execute("UPDATE cards SET reponse = ?, probabilite = ? WHERE id = ?",(reponse, probabilite, id))
-
-            if c.rowcount == 0:
-                raise ValueError(f"⚠️ Carte avec l'id {id} introuvable.")
+            with self.transaction() as conn:
+                c = conn.cursor()
+                c.execute(query, values)
+                # Si on modifie par exemple les champs reponse et probabilite, on obtient quelque chose équivalent à :
+                # c.execute("UPDATE cards SET reponse = ?, probabilite = ? WHERE id = ?",(reponse, probabilite, id))
+
+                if c.rowcount == 0:
+                    raise ValueError(f"⚠️ Carte avec l'id {id} introuvable.")
+                if "reponse" in updates:
+                    store_answers(conn, [(id, reponse)])
+                if "question" in updates or "reponse" in updates:
+                    index_duplicates(
+                        conn,
+                        conn.execute(
+                            "SELECT id, question, reponse FROM cards WHERE id = ?",
+                            (id,),
+                        ).fetchall(),
+                    )
 
-            conn.commit()
-            print(f"✅ Carte avec l'id {id} mise à jour avec succès.")
+            logger.debug("✅ Carte avec l'id %s mise à jour avec succès.", id)
 
         except sqlite3.Error as e:
-            print(f"❌ Erreur lors de la mise à jour de la carte : {e}")
-
-        finally:
-            conn.close()
+            logger.error("❌ Erreur lors de la mise à jour de la carte : %s", e)
 
+    @instrumented
     def delete_card(self, id):
         # Supprimer une carte de la table cards
         try:
-            conn = self.connect()
-            c = conn.cursor()
-            c.execute("DELETE FROM cards WHERE id = ?", (id,))
+            with self.transaction() as conn:
+                c = conn.cursor()
+                c.execute("DELETE FROM cards WHERE id = ?", (id,))
 
-            if c.rowcount == 0:
-                raise ValueError(f"⚠️ Carte avec l'id {id} introuvable.")
+                if c.rowcount == 0:
+                    raise ValueError(f"⚠️ Carte avec l'id {id} introuvable.")
 
-            conn.commit()
-            print(f"✅ Carte {id} supprimée avec succès.")
+            logger.debug("✅ Carte %s supprimée avec succès.", id)
 
         except sqlite3.Error as e:
-            print(f"❌ Erreur lors de ... : {e}")
-
-        finally:
-            conn.close()
+            logger.error("❌ Erreur lors de ... : %s", e)
 
+    @instrumented
+    @cached_read
     def get_all_cards(self):
         # Récupérer toutes les cartes
         try:
-            conn = self.connect()
-            c = conn.cursor()
-            c.execute("SELECT * FROM cards")
-            results = (
-                c.fetchall()
-            )  # Liste de tuples (id, question, reponse, probabilite, id_theme)
+            with self.connection() as conn:
+                c = conn.cursor()
+                c.execute(f"SELECT {CARD_COLUMNS} FROM cards")
+                results = Card.from_rows(c)  # Liste de Card
 
             if not results:
-                print("⚠️ Aucune carte trouvée.")
+                logger.info("⚠️ Aucune carte trouvée.")
                 return []
             else:
-                print(f"✅ {len(results)} carte(s) récupérée(s) avec succès.")
+                logger.debug("✅ %s carte(s) récupérée(s) avec succès.", len(results))
                 return results
 
         except sqlite3.Error as e:
-            print(f"❌ Erreur lors de la récupération des cartes : {e}")
+            logger.error("❌ Erreur lors de la récupération des cartes : %s", e)
             return []
 
-        finally:
-            conn.close()
-
+    @instrumented
+    @cached_read
     def get_number_of_cards(self):
         # Comptage des cartes
         try:
-            conn = self.connect()
-            c = conn.cursor()
-            c.execute("SELECT COUNT(*) FROM cards")
-            result = c.fetchone()
-            print("✅ Cartes comptées avec succès.")
+            with self.connection() as conn:
+                c = conn.cursor()
+                c.execute("SELECT COUNT(*) FROM cards")
+                result = c.fetchone()
+            logger.debug("✅ Cartes comptées avec succès.")
             return result[0]
 
         except sqlite3.Error as e:
-            print(f"❌ Erreur lors du comptage des cartes : {e}")
+            logger.error("❌ Erreur lors du comptage des cartes : %s", e)
             return 0
 
-        finally:
-            conn.close()
+    @instrumented
+    def get_cards_page(self, after_id=0, page_size=50, id_theme=None):
+        # Page de cartes triées par id, à partir de la carte qui suit after_id
+        # (pagination par clé : coût indépendant de la position dans la table).
+        # Pour la page suivante, passer l'id de la dernière carte reçue.
+        query = f"SELECT {CARD_COLUMNS} FROM cards WHERE id > ?"
+        params = [after_id]
+        if id_theme is not None:
+            query += " AND id_theme = ?"
+            params.append(id_theme)
+        query += " ORDER BY id LIMIT ?"
+        try:
+            with self.connection() as conn:
+                results = Card.from_rows(conn.execute(query, params + [page_size]))
+            logger.debug("✅ Page de %s carte(s) récupérée(s).", len(results))
+            return results
+
+        except sqlite3.Error as e:
+            logger.error(
+                "❌ Erreur lors de la récupération d'une page de cartes : %s", e
+            )
+            return []
+
+    def iter_cards(self, page_size=500, id_theme=None):
+        # Parcourt toutes les cartes (éventuellement d'un thème) page par page
+        after_id = 0
+        while True:
+            page = self.get_cards_page(after_id, page_size, id_theme)
+            yield from page
+            if len(page) < page_size:
+                return
+            after_id = page[-1].id
+
+    @instrumented
+    def search(self, query, theme_ids=None, limit=20):
+        # Recherche plein texte dans les questions et réponses (index cards_fts),
+        # résultats classés par pertinence (BM25, la question pèse double)
+        match = fts_query(query)
+        if not match:
+            return []
+        sql = """
+            SELECT c.id, c.question, c.reponse, c.probabilite, c.id_theme
+            FROM cards_fts JOIN cards c ON c.id = cards_fts.rowid
+            WHERE cards_fts MATCH ?
+        """
+        params = [match]
+        if theme_ids is not None:
+            theme_ids = list(theme_ids)
+            if not theme_ids:
+                return []
+            sql += f" AND c.id_theme IN ({','.join('?' * len(theme_ids))})"
+            params.extend(theme_ids)
+        sql += " ORDER BY bm25(cards_fts, 2.0, 1.0) LIMIT ?"
+        params.append(limit)
+        try:
+            with self.connection() as conn:
+                results = Card.from_rows(conn.execute(sql, params))
+            logger.debug("✅ %s carte(s) trouvée(s) pour %r.", len(results), query)
+            return results
+
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de la recherche de cartes : %s", e)
+            return []
 
+    @instrumented
     def get_cards_by_theme(self, id_theme):
         # Récupérer les cartes appartenant à un thème en particulier
         try:
-            conn = self.connect()
-            c = conn.cursor()
+            with self.connection() as conn:
+                c = conn.cursor()
 
-            # Vérifier si le thème existe
-            c.execute("SELECT 1 FROM themes WHERE id_theme=?", (id_theme,))
-            theme_exists = c.fetchone()
-            if not theme_exists:
-                print(f"⚠️ Le thème avec l'id {id_theme} n'existe pas.")
-                return None
+                # Vérifier si le thème existe
+                c.execute("SELECT 1 FROM themes WHERE id_theme=?", (id_theme,))
+                theme_exists = c.fetchone()
+                if not theme_exists:
+                    logger.info("⚠️ Le thème avec l'id %s n'existe pas.", id_theme)
+                    return None
 
-            c.execute("SELECT * FROM cards WHERE id_theme=?", (id_theme,))
-            results = (
-                c.fetchall()
-            )  # Liste de tuples (id, question, reponse, probabilite, id_theme)
+                c.execute(
+                    f"SELECT {CARD_COLUMNS} FROM cards WHERE id_theme=?", (id_theme,)
+                )
+                results = Card.from_rows(c)  # Liste de Card
 
             if not results:
-                print(f"⚠️ Aucune carte trouvée pour le thème {id_theme}.")
+                logger.info("⚠️ Aucune carte trouvée pour le thème %s.", id_theme)
                 return []
             else:
-                print(
-                    f"✅ {len(results)} carte(s) récupérée(s) pour le thème {id_theme}."
+                logger.debug(
+                    "✅ %s carte(s) récupérée(s) pour le thème %s.",
+                    len(results),
+                    id_theme,
                 )
                 return results
 
         except sqlite3.Error as e:
-            print(f"❌ Erreur lors de la récupération des cartes par thème : {e}")
+            logger.error(
+                "❌ Erreur lors de la récupération des cartes par thème : %s", e
+            )
             return []
 
+    @instrumented
+    def get_cards_by_themes(self, theme_ids):
+        # Récupérer en une seule requête les cartes d'un ensemble de thèmes.
+        # Les thèmes inexistants sont simplement ignorés.
+        ids = list(dict.fromkeys(theme_ids))  # Dédoublonne en gardant l'ordre
+        try:
+            cards = []
+            with self.connection() as conn:
+                for query, chunk in self._cards_by_themes_queries(ids):
+                    cards.extend(Card.from_rows(conn.execute(query, chunk)))
+            logger.debug(
+                "✅ %s carte(s) récupérée(s) pour %s thème(s).", len(cards), len(ids)
+            )
+            return cards
+
+        except sqlite3.Error as e:
+            logger.error(
+                "❌ Erreur lors de la récupération des cartes par thèmes : %s", e
+            )
+            return []
+
+    def iter_cards_by_themes(self, theme_ids, batch_size=500):
+        # Version itérateur : les cartes sont lues par paquets de batch_size,
+        # sans charger tout le résultat en mémoire. Le curseur reste ouvert entre deux
+        # paquets : il lit sur une connexion dédiée, jamais sur celle que le thread a
+        # empruntée à la réserve (l'appelant peut y mener une transaction entre-temps)
+        ids = list(dict.fromkeys(theme_ids))
+        conn = self.pool.open()
+        try:
+            for query, chunk in self._cards_by_themes_queries(ids):
+                c = conn.execute(query, chunk)
+                while True:
+                    rows = c.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield from Card.from_rows(rows)
         finally:
             conn.close()
 
+    @staticmethod
+    def _cards_by_themes_queries(ids):
+        # Liste IN liée, découpée pour rester sous la limite de paramètres SQLite
+        for start in range(0, len(ids), MAX_SQL_PARAMS):
+            chunk = ids[start : start + MAX_SQL_PARAMS]
+            placeholders = ", ".join("?" * len(chunk))
+            yield (
+                f"SELECT {CARD_COLUMNS} FROM cards WHERE id_theme IN ({placeholders})",
+                chunk,
+            )
+
+    @instrumented
+    def get_card_weights_by_themes(self, theme_ids):
+        # Récupérer uniquement (id, probabilite) des cartes d'un ensemble de thèmes :
+        # suffisant pour le tirage, lu directement dans l'index idx_cards_theme_proba
+        ids = list(dict.fromkeys(theme_ids))
+        try:
+            results = []
+            with self.connection() as conn:
+                for start in range(0, len(ids), MAX_SQL_PARAMS):
+                    chunk = ids[start : start + MAX_SQL_PARAMS]
+                    placeholders = ", ".join("?" * len(chunk))
+                    results.extend(
+                        conn.execute(
+                            f"SELECT id, probabilite FROM cards WHERE id_theme IN ({placeholders})",
+                            chunk,
+                        )
+                    )
+            logger.debug("✅ %s poids de carte(s) récupéré(s).", len(results))
+            return results  # Liste de tuples (id, probabilite)
+
+        except sqlite3.Error as e:
+            logger.error(
+                "❌ Erreur lors de la récupération des poids des cartes : %s", e
+            )
+            return []
+
+    @instrumented
+    def get_deck(self, theme_ids):
+        # Paquet des cartes d'un ensemble de thèmes, rangé par colonnes (voir Deck) :
+        # seuls id, id_theme et probabilite sont lus, dans l'index idx_cards_theme_proba ;
+        # le texte des cartes est chargé à la demande par get_cards_by_ids
+        ids = list(dict.fromkeys(theme_ids))
+        deck = Deck(loader=self.get_cards_by_ids)
+        try:
+            with self.connection() as conn:
+                for start in range(0, len(ids), MAX_SQL_PARAMS):
+                    chunk = ids[start : start + MAX_SQL_PARAMS]
+                    placeholders = ", ".join("?" * len(chunk))
+                    deck.extend(
+                        conn.execute(
+                            f"SELECT id, id_theme, probabilite FROM cards WHERE id_theme IN ({placeholders})",
+                            chunk,
+                        )
+                    )
+            logger.debug("✅ Paquet de %s carte(s) construit.", len(deck))
+
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de la construction du paquet : %s", e)
+
+        return deck
+
+    @instrumented
+    def get_cards_by_ids(self, card_ids):
+        # Récupérer en une requête les cartes d'une liste d'ids, dans l'ordre de la liste.
+        # Les ids inexistants sont ignorés.
+        ids = list(dict.fromkeys(card_ids))
+        try:
+            par_id = {}
+            with self.connection() as conn:
+                for start in range(0, len(ids), MAX_SQL_PARAMS):
+                    chunk = ids[start : start + MAX_SQL_PARAMS]
+                    placeholders = ", ".join("?" * len(chunk))
+                    for carte in Card.from_rows(
+                        conn.execute(
+                            f"SELECT {CARD_COLUMNS} FROM cards WHERE id IN ({placeholders})",
+                            chunk,
+                        )
+                    ):
+                        par_id[carte.id] = carte
+            logger.debug("✅ %s carte(s) récupérée(s) par id.", len(par_id))
+            return [par_id[i] for i in ids if i in par_id]
+
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de la récupération des cartes par id : %s", e)
+            return []
+
 
 class ThemeManager(Database):
     # la classe ThemeManager hérite de la classe Database
     # === Fonctions CRUD pour les Thèmes ===
+    @instrumented
     def create_theme(self, theme):
         # Créer un thème
         try:
-            conn = self.connect()
-            c = conn.cursor()
-            c.execute(
-                """
-                INSERT INTO themes (theme)
-                VALUES (?)
-            """,
-                (theme,),
-            )
-            conn.commit()
-            print("✅ Thème créé avec succès.")
+            with self.transaction() as conn:
+                c = conn.cursor()
+                c.execute(
+                    """
+                    INSERT INTO themes (theme)
+                    VALUES (?)
+                """,
+                    (theme,),
+                )
+            logger.debug("✅ Thème créé avec succès.")
 
         except sqlite3.Error as e:
-            print(f"❌ Erreur lors de la création du thème : {e}")
-
-        finally:
-            conn.close()
+            logger.error("❌ Erreur lors de la création du thème : %s", e)
 
+    @instrumented
+    @cached_read
     def get_theme(self, id_theme):
         # Récupérer un thème
         try:
-            conn = self.connect()
-            c = conn.cursor()
-            c.execute("SELECT * FROM themes WHERE id_theme = ?", (id_theme,))
-            result = c.fetchone()
+            with self.connection() as conn:
+                c = conn.cursor()
+                c.execute("SELECT * FROM themes WHERE id_theme = ?", (id_theme,))
+                result = c.fetchone()
 
             if result is None:
                 raise ValueError(f"⚠️ Thème avec l'id {id_theme} introuvable.")
             else:
-                print(f"✅ Thème avec l'id {id_theme} récupéré avec succès.")
+                logger.debug("✅ Thème avec l'id %s récupéré avec succès.", id_theme)
 
             return result
 
         except sqlite3.Error as e:
-            print(f"❌ Erreur lors de la récupération du thème : {e}")
+            logger.error("❌ Erreur lors de la récupération du thème : %s", e)
             return None
 
-        finally:
-            conn.close()
-
+    @instrumented
     def update_theme(self, id_theme, new_theme=None):
         # Mise à jour d'un thème
         try:
-            conn = self.connect()
-            c = conn.cursor()
-
             # Dictionnaire des champs à mettre à jour
             fields = {
                 "theme": new_theme,
@@ -324,7 +1527,7 @@ class ThemeManager(Database):
             updates = {k: v for k, v in fields.items() if v is not None}
 
             if not updates:
-                print("⚠️ Aucun champ à mettre à jour.")
+                logger.info("⚠️ Aucun champ à mettre à jour.")
                 return
 
             # Construction dynamique de la requête SQL
@@ -332,227 +1535,1555 @@ class ThemeManager(Database):
             values = list(updates.values()) + [id_theme]
 
             query = f"UPDATE themes SET {set_clause} WHERE id_theme = ?"
-            c.execute(query, values)
+            with self.transaction() as conn:
+                c = conn.cursor()
+                c.execute(query, values)
 
-            if c.rowcount == 0:
-                raise ValueError(f"⚠️ Thème avec l'id {id_theme} introuvable.")
+                if c.rowcount == 0:
+                    raise ValueError(f"⚠️ Thème avec l'id {id_theme} introuvable.")
 
-            conn.commit()
-            print(f"✅ Thème avec l'id {id_theme} mise à jour avec : {new_theme}")
+            logger.debug(
+                "✅ Thème avec l'id %s mise à jour avec : %s", id_theme, new_theme
+            )
 
         except sqlite3.Error as e:
-            print(f"❌ Erreur lors de la mise à jour du thème : {e}")
-
-        finally:
-            conn.close()
+            logger.error("❌ Erreur lors de la mise à jour du thème : %s", e)
 
+    @instrumented
     def delete_theme(self, id_theme):
         # Supprimer un thème de la table themes
         try:
-            conn = self.connect()
-            c = conn.cursor()
-            c.execute("DELETE FROM themes WHERE id_theme = ?", (id_theme,))
+            with self.transaction() as conn:
+                c = conn.cursor()
+                c.execute("DELETE FROM themes WHERE id_theme = ?", (id_theme,))
 
-            if c.rowcount == 0:
-                raise ValueError(f"⚠️ Thème avec l'id {id_theme} introuvable.")
+                if c.rowcount == 0:
+                    raise ValueError(f"⚠️ Thème avec l'id {id_theme} introuvable.")
 
-            conn.commit()
-            print(f"✅ Thème {id_theme} supprimé avec succès.")
+            logger.debug("✅ Thème %s supprimé avec succès.", id_theme)
 
         except sqlite3.Error as e:
-            print(f"❌ Erreur lors de ... : {e}")
-
-        finally:
-            conn.close()
+            logger.error("❌ Erreur lors de ... : %s", e)
 
+    @instrumented
+    @cached_read
     def get_all_themes(self):
         # Récupérer tous les thèmes
         try:
-            conn = self.connect()
-            c = conn.cursor()
-            c.execute("SELECT * FROM themes")
-            results = c.fetchall()  # Liste de tuples (id_theme, theme)
+            with self.connection() as conn:
+                c = conn.cursor()
+                c.execute("SELECT * FROM themes")
+                results = c.fetchall()  # Liste de tuples (id_theme, theme)
 
             if not results:
-                print("⚠️ Aucun thème trouvé.")
+                logger.info("⚠️ Aucun thème trouvé.")
                 return []
             else:
-                print(f"✅ {len(results)} thème(s) récupéré(s) avec succès.")
+                logger.debug("✅ %s thème(s) récupéré(s) avec succès.", len(results))
                 return results
 
         except sqlite3.Error as e:
-            print(f"❌ Erreur lors de la récupération des thèmes : {e}")
+            logger.error("❌ Erreur lors de la récupération des thèmes : %s", e)
             return None
 
-        finally:
-            conn.close()
-
 
 class StatsManager(Database):
     # la classe StatsManager hérite de la classe Database
     # === Fonctions CRUD pour les Statistiques ===
+    @instrumented
     def update_stats(self, is_correct):
-        #
+        # Incrémente les statistiques du jour en une seule requête (UPSERT)
         try:
-            conn = self.connect()
-            c = conn.cursor()
             # Récupération et formatage de la date du jour
             today = datetime.now().strftime("%Y-%m-%d")
+            bonnes_reponses = 1 if is_correct else 0
+            mauvaises_reponses = 0 if is_correct else 1
 
-            # Vérifier s’il y a déjà des stats pour aujourd’hui
-            c.execute("SELECT * FROM stats WHERE date=?", (today,))
-            result = (
-                c.fetchone()
-            )  # Liste de tuples (id, bonnes_reponses, mauvaises_reponses, date)
+            with self.transaction() as conn:
+                conn.execute(UPSERT_STATS, (bonnes_reponses, mauvaises_reponses, today))
+            logger.debug("✅ Statistiques du jour mises à jour avec succès.")
 
-            if result is None:
-                print(
-                    "pas d'entrée pour la date du jour. Création d'une nouvelle entrée."
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de la mise à jour des statistiques : %s", e)
+
+    @instrumented
+    def update_card_probability(self, card_id, is_correct):
+        #
+        try:
+            with self.transaction() as conn:
+                c = conn.cursor()
+
+                # Récupération de la probabilité actuelle
+                c.execute("SELECT probabilite FROM cards WHERE id=?", (card_id,))
+                result = c.fetchone()
+
+                if result is None:
+                    raise ValueError(f"⚠️ Carte avec l'id {card_id} introuvable.")
+
+                # Mise à jour selon la réponse, encadrée entre 0.1 et 1.0
+                proba = next_probability(result[0], is_correct)
+
+                # Mise à jour dans la base
+                c.execute("UPDATE cards SET probabilite=? WHERE id=?", (proba, card_id))
+            logger.debug(
+                "✅ Probabilité de la carte %s mise à jour à %s.",
+                card_id,
+                round(proba, 3),
+            )
+            return proba
+
+        except sqlite3.Error as e:
+            logger.error(
+                "❌ Erreur SQLite lors de la mise à jour de la probabilité : %s", e
+            )
+
+        except ValueError as ve:
+            logger.warning("%s", ve)
+
+    @instrumented
+    def record_answer(self, card_id, is_correct, response_time=None, scheduler=None):
+        # Enregistre une réponse dans une seule transaction : probabilité de la carte
+        # (calcul côté SQL) et ajout au journal des révisions, dont découlent
+        # les statistiques du jour et celles de la carte ; avec un SchedulerManager,
+        # la prochaine révision est planifiée dans la même transaction.
+        # response_time : durée de réponse en secondes (optionnelle)
+        try:
+            now = datetime.now()
+            with self.transaction() as conn:
+                answer = (
+                    card_id,
+                    is_correct,
+                    now.strftime(FORMAT_REVISION),
+                    response_time,
                 )
+                if self._apply_answers(conn, [answer]) == 0:
+                    raise ValueError(f"⚠️ Carte avec l'id {card_id} introuvable.")
+                if scheduler is not None:
+                    scheduler._schedule(conn, card_id, is_correct, now=now)
+            logger.debug("✅ Réponse enregistrée pour la carte %s.", card_id)
+            return True
 
-                bonnes_reponses = 1 if is_correct else 0
-                mauvaises_reponses = 0 if is_correct else 1
+        except sqlite3.Error as e:
+            logger.error(
+                "❌ Erreur SQLite lors de l'enregistrement de la réponse : %s", e
+            )
+            return False
 
-                c.execute(
-                    """
-                    INSERT INTO stats (bonnes_reponses, mauvaises_reponses, date)
-                    VALUES (?, ?, ?)
-                    """,
-                    (bonnes_reponses, mauvaises_reponses, today),
+        except ValueError as ve:
+            logger.warning("%s", ve)
+            return False
+
+    @instrumented
+    def record_answers(self, answers):
+        # Enregistre en une seule transaction un lot de réponses
+        # (card_id, is_correct, date_revision, response_time)
+        try:
+            with self.transaction() as conn:
+                nb_cards = self._apply_answers(conn, answers)
+            logger.debug(
+                "✅ %s réponse(s) enregistrée(s) (%s carte(s)).", len(answers), nb_cards
+            )
+            return True
+
+        except sqlite3.Error as e:
+            logger.error(
+                "❌ Erreur SQLite lors de l'enregistrement des réponses : %s", e
+            )
+            return False
+
+    def _apply_answers(self, conn, answers):
+        # Applique les réponses sur une connexion déjà en transaction.
+        # Renvoie le nombre de cartes effectivement mises à jour.
+        c = conn.cursor()
+
+        # Probabilités : même règle que update_card_probability, dans l'ordre des réponses
+        c.executemany(
+            """
+            UPDATE cards SET probabilite = MAX(?, MIN(?, probabilite * ?))
+            WHERE id = ?
+            """,
+            [
+                (
+                    PROBA_MIN,
+                    PROBA_MAX,
+                    FACTEUR_BONNE_REPONSE if is_correct else FACTEUR_MAUVAISE_REPONSE,
+                    card_id,
                 )
-                conn.commit()
-                print("✅ Statistiques du jour créées avec succès.")
+                for card_id, is_correct, _, _ in answers
+            ],
+        )
+        nb_cards = c.rowcount
+
+        # Journal des révisions, inséré par lot. Le déclencheur reviews_aggregats
+        # met à jour stats et card_stats ; une carte inexistante n'est pas journalisée.
+        c.executemany(
+            """
+            INSERT INTO reviews (card_id, id_theme, correct, date_revision, temps_reponse)
+            SELECT id, id_theme, ?, ?, ? FROM cards WHERE id = ?
+            """,
+            [
+                (int(bool(is_correct)), date_revision, response_time, card_id)
+                for card_id, is_correct, date_revision, response_time in answers
+            ],
+        )
+
+        return nb_cards
+
+    @instrumented
+    def get_card_stats(self, card_id):
+        # Cumul des réponses d'une carte, tenu à jour à partir du journal
+        try:
+            with self.connection() as conn:
+                return conn.execute(
+                    "SELECT * FROM card_stats WHERE card_id = ?", (card_id,)
+                ).fetchone()  # Tuple (card_id, bonnes_reponses, mauvaises_reponses, derniere_revision)
+
+        except sqlite3.Error as e:
+            logger.error(
+                "❌ Erreur lors de la récupération des stats de la carte : %s", e
+            )
+            return None
+
+    @instrumented
+    def get_reviews(self, card_id=None, since=None, limit=100):
+        # Dernières révisions du journal, éventuellement filtrées par carte et par date
+        conditions, params = [], []
+        if card_id is not None:
+            conditions.append("card_id = ?")
+            params.append(card_id)
+        if since is not None:
+            conditions.append("date_revision >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        try:
+            with self.connection() as conn:
+                return conn.execute(
+                    f"SELECT * FROM reviews {where} ORDER BY id DESC LIMIT ?",
+                    params + [limit],
+                ).fetchall()  # Liste de tuples (id, card_id, id_theme, correct, date_revision, temps_reponse)
+
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de la récupération des révisions : %s", e)
+            return []
+
+    @instrumented
+    @cached_read
+    def get_stats(self):
+        # Récupérer les statistiques
+        try:
+            with self.connection() as conn:
+                c = conn.cursor()
+                c.execute("SELECT * FROM stats ORDER BY date ASC")
+                results = (
+                    c.fetchall()
+                )  # Liste de tuples (id, bonnes_reponses, mauvaises_reponses, date)
 
+            if not results:
+                logger.info("⚠️ Aucune entrée trouvée.")
+                return []
             else:
-                id = result[0]
-                bonnes_reponses = result[1]
-                mauvaises_reponses = result[2]
+                logger.debug("✅ %s entrée(s) récupérée(s) avec succès.", len(results))
+                return results
 
-                if is_correct:
-                    bonnes_reponses += 1
-                else:
-                    mauvaises_reponses += 1
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de la récupération des statistiques : %s", e)
+            return []
 
-                c.execute(
-                    """ 
-                        UPDATE stats SET bonnes_reponses=?, mauvaises_reponses=? WHERE id=?
-                        """,
-                    (bonnes_reponses, mauvaises_reponses, id),
-                )
+    # Début de la période (jour, semaine commençant le lundi, mois) d'une date
+    BUCKETS = {
+        "day": "date",
+        "week": "date(date, '-6 days', 'weekday 1')",
+        "month": "strftime('%Y-%m-01', date)",
+    }
+
+    @instrumented
+    @cached_read
+    def get_stats_series(self, date_from=None, date_to=None, bucket="day", window=7):
+        # Série agrégée en SQL, un point par période : (periode, bonnes, mauvaises,
+        # taux de réussite en %, taux de réussite glissant sur les window dernières
+        # périodes). Seuls les points à tracer sont renvoyés, quelle que soit la durée.
+        if bucket not in self.BUCKETS:
+            raise ValueError(f"❌ Période inconnue : {bucket!r}.")
+        try:
+            with self.connection() as conn:
+                results = conn.execute(
+                    f"""
+                    WITH periodes AS (
+                        SELECT {self.BUCKETS[bucket]} AS periode,
+                        SUM(bonnes_reponses) AS bonnes, SUM(mauvaises_reponses) AS mauvaises
+                        FROM stats WHERE date >= ? AND date <= ?
+                        GROUP BY periode
+                    )
+                    SELECT periode, bonnes, mauvaises,
+                    ROUND(100.0 * bonnes / NULLIF(bonnes + mauvaises, 0), 1),
+                    ROUND(100.0 * SUM(bonnes) OVER glissant
+                        / NULLIF(SUM(bonnes + mauvaises) OVER glissant, 0), 1)
+                    FROM periodes
+                    WINDOW glissant AS (ORDER BY periode ROWS BETWEEN ? PRECEDING AND CURRENT ROW)
+                    ORDER BY periode
+                    """,
+                    (
+                        date_from or "0000-00-00",
+                        date_to or "9999-12-31",
+                        max(int(window), 1) - 1,
+                    ),
+                ).fetchall()
+            logger.debug(
+                "✅ Série de %s point(s) (%s) récupérée.", len(results), bucket
+            )
+            return results
+
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de l'agrégation des statistiques : %s", e)
+            return []
 
-                conn.commit()
-                print(f"✅ Statistiques avec l'id {id} mises à jour avec succès.")
+    @instrumented
+    @cached_read
+    def get_stats_bounds(self):
+        # Première et dernière date des statistiques (None, None si aucune)
+        try:
+            with self.connection() as conn:
+                return conn.execute("SELECT MIN(date), MAX(date) FROM stats").fetchone()
 
         except sqlite3.Error as e:
-            print(f"❌ Erreur lors de la mise à jour des statistiques : {e}")
+            logger.error(
+                "❌ Erreur lors de la lecture des dates des statistiques : %s", e
+            )
+            return None, None
 
-        finally:
-            conn.close()
+    @instrumented
+    @cached_read
+    def get_theme_stats(self, date_from=None, date_to=None):
+        # Bonnes et mauvaises réponses par thème, en une requête sur les cumuls.
+        # Sans bornes de dates, lecture directe des totaux ; sinon somme des jours.
+        try:
+            with self.connection() as conn:
+                if date_from is None and date_to is None:
+                    c = conn.execute(
+                        """
+                        SELECT t.id_theme, t.theme, s.bonnes_reponses, s.mauvaises_reponses
+                        FROM theme_stats s JOIN themes t ON t.id_theme = s.id_theme
+                        ORDER BY t.theme
+                        """
+                    )
+                else:
+                    c = conn.execute(
+                        """
+                        SELECT t.id_theme, t.theme,
+                        SUM(s.bonnes_reponses), SUM(s.mauvaises_reponses)
+                        FROM theme_stats_jour s JOIN themes t ON t.id_theme = s.id_theme
+                        WHERE s.date >= ? AND s.date <= ?
+                        GROUP BY t.id_theme ORDER BY t.theme
+                        """,
+                        (date_from or "0000-00-00", date_to or "9999-12-31"),
+                    )
+                results = (
+                    c.fetchall()
+                )  # Liste de tuples (id_theme, theme, bonnes_reponses, mauvaises_reponses)
+            logger.debug("✅ Statistiques de %s thème(s) récupérées.", len(results))
+            return results
 
-    def update_card_probability(self, card_id, is_correct):
-        #
+        except sqlite3.Error as e:
+            logger.error(
+                "❌ Erreur lors de la récupération des stats par thème : %s", e
+            )
+            return []
+
+    @instrumented
+    @cached_read
+    def get_theme_daily_stats(self, id_theme=None, date_from=None, date_to=None):
+        # Bonnes et mauvaises réponses par jour et par thème (un thème ou tous)
+        conditions = ["s.date >= ?", "s.date <= ?"]
+        params = [date_from or "0000-00-00", date_to or "9999-12-31"]
+        if id_theme is not None:
+            conditions.append("s.id_theme = ?")
+            params.append(id_theme)
         try:
-            conn = self.connect()
-            c = conn.cursor()
+            with self.connection() as conn:
+                results = conn.execute(
+                    f"""
+                    SELECT s.date, t.id_theme, t.theme, s.bonnes_reponses, s.mauvaises_reponses
+                    FROM theme_stats_jour s JOIN themes t ON t.id_theme = s.id_theme
+                    WHERE {' AND '.join(conditions)} ORDER BY s.date, t.theme
+                    """,
+                    params,
+                ).fetchall()  # Liste de tuples (date, id_theme, theme, bonnes_reponses, mauvaises_reponses)
+            logger.debug(
+                "✅ %s entrée(s) par thème et par jour récupérée(s).", len(results)
+            )
+            return results
+
+        except sqlite3.Error as e:
+            logger.error(
+                "❌ Erreur lors de la récupération des stats par thème : %s", e
+            )
+            return []
 
-            # Récupération de la probabilité actuelle
-            c.execute("SELECT probabilite FROM cards WHERE id=?", (card_id,))
-            result = c.fetchone()
 
-            if result is None:
-                raise ValueError(f"⚠️ Carte avec l'id {card_id} introuvable.")
+class SchedulerManager(Database):
+    """
+    Planificateur de révision espacée. Chaque carte garde sa date de prochaine révision ;
+    les cartes dues sont servies par l'index (id_theme, prochaine_revision), sans
+    parcourir tout le paquet. Deux modes :
+    - "leitner" : boîtes 1 à 5, une bonne réponse fait monter d'une boîte,
+      une erreur renvoie en boîte 1 ;
+    - "sm2" : algorithme SM-2 (facteur de facilité, intervalle croissant).
+    """
+
+    MODES = ("leitner", "sm2")
+
+    def __init__(self, db_name=DB_PATH, mode="leitner"):
+        super().__init__(db_name)
+        if mode not in self.MODES:
+            raise ValueError(f"❌ Mode de révision inconnu : {mode!r}.")
+        self.mode = mode
+
+    @instrumented
+    def review(self, card_id, is_correct, quality=None, now=None):
+        # Enregistre une révision et planifie la suivante.
+        # quality (0 à 5, mode SM-2) vaut par défaut 4 si la réponse est juste, 2 sinon.
+        try:
+            with self.transaction() as conn:
+                prochaine = self._schedule(conn, card_id, is_correct, quality, now)
+            logger.debug("✅ Carte %s à revoir le %s.", card_id, prochaine)
+            return prochaine
 
-            proba = result[0]
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de la planification de la révision : %s", e)
 
-            # Mise à jour selon la réponse
-            if is_correct:
-                proba = 0.9 * proba
+        except ValueError as ve:
+            logger.warning("%s", ve)
+
+    def _schedule(self, conn, card_id, is_correct, quality=None, now=None):
+        # Planifie la prochaine révision sur une connexion déjà en transaction
+        # (seule ou avec l'enregistrement de la réponse). Renvoie sa date.
+        now = now or datetime.now()
+        row = conn.execute(
+            "SELECT boite, facilite, intervalle, repetitions FROM cards WHERE id = ?",
+            (card_id,),
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"⚠️ Carte avec l'id {card_id} introuvable.")
+
+        if self.mode == "leitner":
+            boite, facilite, intervalle, repetitions = self._leitner(row, is_correct)
+        else:
+            if quality is None:
+                quality = 4 if is_correct else 2
+            boite, facilite, intervalle, repetitions = self._sm2(row, quality)
+
+        prochaine = (now + timedelta(days=intervalle)).strftime(FORMAT_REVISION)
+        conn.execute(
+            """
+            UPDATE cards SET boite = ?, facilite = ?, intervalle = ?,
+            repetitions = ?, prochaine_revision = ? WHERE id = ?
+            """,
+            (boite, facilite, intervalle, repetitions, prochaine, card_id),
+        )
+        return prochaine
+
+    @staticmethod
+    def _leitner(row, is_correct):
+        boite, facilite, _, repetitions = row
+        boite = min(boite + 1, len(INTERVALLES_LEITNER)) if is_correct else 1
+        repetitions = repetitions + 1 if is_correct else 0
+        return boite, facilite, INTERVALLES_LEITNER[boite - 1], repetitions
+
+    @staticmethod
+    def _sm2(row, quality):
+        boite, facilite, intervalle, repetitions = row
+        if quality < 3:
+            # Réponse ratée : la série repart de zéro
+            repetitions, intervalle = 0, 1
+        else:
+            repetitions += 1
+            if repetitions == 1:
+                intervalle = 1
+            elif repetitions == 2:
+                intervalle = 6
             else:
-                proba = 1.1 * proba
+                intervalle = round(intervalle * facilite)
+        facilite = max(
+            1.3, facilite + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+        )
+        return boite, facilite, intervalle, repetitions
+
+    @instrumented
+    def get_due_cards(self, theme_ids, limit, now=None):
+        # Ids des cartes dues (les plus en retard d'abord), au plus limit.
+        # Une lecture d'index bornée par thème (O(log n + limit)), puis fusion.
+        now = (now or datetime.now()).strftime(FORMAT_REVISION)
+        try:
+            par_theme = []
+            with self.connection() as conn:
+                for id_theme in dict.fromkeys(theme_ids):
+                    par_theme.append(
+                        conn.execute(
+                            """
+                            SELECT prochaine_revision, id FROM cards
+                            WHERE id_theme = ? AND prochaine_revision <= ?
+                            ORDER BY prochaine_revision LIMIT ?
+                            """,
+                            (id_theme, now, limit),
+                        ).fetchall()
+                    )
+            dues = [card_id for _, card_id in heapq.merge(*par_theme)][:limit]
+            logger.debug("✅ %s carte(s) due(s).", len(dues))
+            return dues
+
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de la récupération des cartes dues : %s", e)
+            return []
+
+
+class UserManager(Database):
+    """
+    Quizz d'un utilisateur sur le paquet partagé. Le contenu des cartes est commun ;
+    la probabilité, la planification et les statistiques sont propres à l'utilisateur
+    (tables user_cards et user_stats, indexées par user_id). Une carte jamais vue par
+    l'utilisateur n'a pas de ligne : elle part de PROBA_INITIALE et est due (la colonne
+    cards.probabilite suit les réponses données sans utilisateur, pas les siennes).
+
+    Avec shards=n, l'état des utilisateurs est réparti dans n fichiers
+    (flashcards.users-000.db, ...) qui rattachent la base principale en lecture seule :
+    les réponses d'utilisateurs de partitions différentes ne se disputent pas le verrou
+    d'écriture, ni entre elles ni avec l'édition des cartes.
+    """
+
+    _schemas_prets = set()  # Fichiers de partition dont le schéma a été créé
+    _schemas_lock = threading.Lock()
+
+    def __init__(self, user_id, db_name=DB_PATH, mode="leitner", shards=None):
+        self.user_id = str(user_id)
+        self.mode = mode
+        if shards:
+            state_db = self.shard_path(db_name, self.user_id, shards)
+            self.db_name = state_db
+            self.pool = get_pool(state_db, attach=(("deck", db_name),))
+            self._ensure_schema()
+        else:
+            super().__init__(db_name)
+
+    @staticmethod
+    def shard_path(db_name, user_id, shards):
+        # Partition stable d'un utilisateur (crc32, identique d'un processus à l'autre)
+        racine, extension = os.path.splitext(db_name)
+        numero = zlib.crc32(str(user_id).encode("utf-8")) % shards
+        return f"{racine}.users-{numero:03d}{extension or '.db'}"
+
+    def _ensure_schema(self):
+        # Crée les tables d'état au premier accès à un fichier de partition
+        key = os.path.abspath(self.db_name)
+        with self._schemas_lock:
+            if key in self._schemas_prets:
+                return
+            with self.transaction() as conn:
+                for ddl in USER_STATE_SCHEMA:
+                    conn.execute(ddl)
+            self._schemas_prets.add(key)
+
+    # Les requêtes ci-dessous lisent "cards" : la table de la base principale, ou celle
+    # de la base rattachée en lecture seule quand l'état est partitionné.
+
+    @instrumented
+    def get_card_weights_by_themes(self, theme_ids):
+        # (id, probabilite) des cartes des thèmes, avec la probabilité de l'utilisateur
+        ids = list(dict.fromkeys(theme_ids))
+        try:
+            results = []
+            with self.connection() as conn:
+                # Un paramètre pour la probabilité initiale, un pour l'utilisateur
+                for start in range(0, len(ids), MAX_SQL_PARAMS - 2):
+                    chunk = ids[start : start + MAX_SQL_PARAMS - 2]
+                    placeholders = ", ".join("?" * len(chunk))
+                    results.extend(
+                        conn.execute(
+                            f"""
+                            SELECT c.id, COALESCE(u.probabilite, ?) FROM cards c
+                            LEFT JOIN user_cards u ON u.user_id = ? AND u.card_id = c.id
+                            WHERE c.id_theme IN ({placeholders})
+                            """,
+                            [PROBA_INITIALE, self.user_id] + chunk,
+                        )
+                    )
+            logger.debug(
+                "✅ %s poids de cartes récupérés pour %s.", len(results), self.user_id
+            )
+            return results
 
-            # Encadrer la probabilité entre 0.1 et 1.0
-            proba = max(0.1, min(proba, 1.0))
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de la récupération des poids : %s", e)
+            return []
+
+    def draw_quiz(self, theme_ids, k):
+        # Tire k identifiants de cartes distincts, pondérés par la probabilité de l'utilisateur
+        poids = self.get_card_weights_by_themes(theme_ids)
+        return sample_without_replacement(
+            [card_id for card_id, _ in poids], [p for _, p in poids], k
+        )
+
+    @instrumented
+    def get_due_cards(self, theme_ids, limit, now=None):
+        # Ids des cartes dues pour l'utilisateur, au plus limit : d'abord les cartes
+        # jamais vues (dues depuis toujours), puis les plus en retard, lues dans
+        # l'index (user_id, prochaine_revision). Thèmes par paquets de MAX_SQL_PARAMS,
+        # résultats fusionnés dans l'ordre.
+        now = (now or datetime.now()).strftime(FORMAT_REVISION)
+        ids = list(dict.fromkeys(theme_ids))
+        if limit <= 0:
+            return []
+        chunks = [
+            ids[start : start + MAX_SQL_PARAMS - 3]
+            for start in range(0, len(ids), MAX_SQL_PARAMS - 3)
+        ]
+        try:
+            with self.connection() as conn:
+                jamais_vues = []
+                for chunk in chunks:
+                    jamais_vues.append(
+                        conn.execute(
+                            f"""
+                            SELECT c.id FROM cards c
+                            WHERE c.id_theme IN ({', '.join('?' * len(chunk))})
+                            AND NOT EXISTS (
+                                SELECT 1 FROM user_cards u
+                                WHERE u.user_id = ? AND u.card_id = c.id
+                            )
+                            ORDER BY c.id LIMIT ?
+                            """,
+                            chunk + [self.user_id, limit],
+                        ).fetchall()
+                    )
+                dues = [card_id for (card_id,) in heapq.merge(*jamais_vues)][:limit]
+                if len(dues) < limit:
+                    en_retard = []
+                    for chunk in chunks:
+                        en_retard.append(
+                            conn.execute(
+                                f"""
+                                SELECT u.prochaine_revision, u.card_id FROM user_cards u
+                                JOIN cards c ON c.id = u.card_id
+                                WHERE u.user_id = ? AND u.prochaine_revision <= ?
+                                AND c.id_theme IN ({', '.join('?' * len(chunk))})
+                                ORDER BY u.prochaine_revision LIMIT ?
+                                """,
+                                [self.user_id, now] + chunk + [limit - len(dues)],
+                            ).fetchall()
+                        )
+                    dues += [card_id for _, card_id in heapq.merge(*en_retard)][
+                        : limit - len(dues)
+                    ]
+            logger.debug("✅ %s carte(s) due(s) pour %s.", len(dues), self.user_id)
+            return dues
 
-            # Mise à jour dans la base
-            c.execute("UPDATE cards SET probabilite=? WHERE id=?", (proba, card_id))
-            conn.commit()
-            print(
-                f"✅ Probabilité de la carte {card_id} mise à jour à {round(proba, 3)}."
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de la récupération des cartes dues : %s", e)
+            return []
+
+    @instrumented
+    def record_answer(
+        self, card_id, is_correct, response_time=None, quality=None, now=None
+    ):
+        # Enregistre une réponse de l'utilisateur en une transaction : nouvelle
+        # probabilité, prochaine révision (mode du planificateur) et statistiques du jour.
+        # Seules les lignes de l'utilisateur sont écrites, jamais la table cards.
+        # response_time est accepté pour la symétrie avec StatsManager.record_answer.
+        now = now or datetime.now()
+        try:
+            with self.transaction() as conn:
+                row = conn.execute(
+                    """
+                    SELECT COALESCE(u.probabilite, ?),
+                    COALESCE(u.boite, 1), COALESCE(u.facilite, 2.5),
+                    COALESCE(u.intervalle, 0), COALESCE(u.repetitions, 0)
+                    FROM cards c
+                    LEFT JOIN user_cards u ON u.user_id = ? AND u.card_id = c.id
+                    WHERE c.id = ?
+                    """,
+                    (PROBA_INITIALE, self.user_id, card_id),
+                ).fetchone()
+                if row is None:
+                    raise ValueError(f"⚠️ Carte avec l'id {card_id} introuvable.")
+
+                proba = next_probability(row[0], is_correct)
+                if self.mode == "leitner":
+                    etat = SchedulerManager._leitner(row[1:], is_correct)
+                else:
+                    if quality is None:
+                        quality = 4 if is_correct else 2
+                    etat = SchedulerManager._sm2(row[1:], quality)
+                prochaine = (now + timedelta(days=etat[2])).strftime(FORMAT_REVISION)
+
+                conn.execute(
+                    """
+                    INSERT INTO user_cards (user_id, card_id, probabilite, prochaine_revision,
+                    boite, facilite, intervalle, repetitions) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(user_id, card_id) DO UPDATE SET
+                    probabilite = excluded.probabilite,
+                    prochaine_revision = excluded.prochaine_revision,
+                    boite = excluded.boite, facilite = excluded.facilite,
+                    intervalle = excluded.intervalle, repetitions = excluded.repetitions
+                    """,
+                    (self.user_id, card_id, proba, prochaine, *etat),
+                )
+                conn.execute(
+                    """
+                    INSERT INTO user_stats (user_id, date, bonnes_reponses, mauvaises_reponses)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(user_id, date) DO UPDATE SET
+                    bonnes_reponses = bonnes_reponses + excluded.bonnes_reponses,
+                    mauvaises_reponses = mauvaises_reponses + excluded.mauvaises_reponses
+                    """,
+                    (
+                        self.user_id,
+                        now.strftime("%Y-%m-%d"),
+                        int(bool(is_correct)),
+                        int(not is_correct),
+                    ),
+                )
+            logger.debug(
+                "✅ Réponse de %s enregistrée pour la carte %s.", self.user_id, card_id
             )
+            return True
 
         except sqlite3.Error as e:
-            print(f"❌ Erreur SQLite lors de la mise à jour de la probabilité : {e}")
+            logger.error(
+                "❌ Erreur SQLite lors de l'enregistrement de la réponse : %s", e
+            )
+            return False
 
         except ValueError as ve:
-            print(ve)
+            logger.warning("%s", ve)
+            return False
 
-        finally:
-            conn.close()
+    @instrumented
+    def get_card_state(self, card_id):
+        # (probabilite, prochaine_revision, boite, facilite, intervalle, repetitions)
+        # de la carte pour l'utilisateur, None s'il ne l'a jamais vue
+        try:
+            with self.connection() as conn:
+                return conn.execute(
+                    """
+                    SELECT probabilite, prochaine_revision, boite, facilite,
+                    intervalle, repetitions FROM user_cards
+                    WHERE user_id = ? AND card_id = ?
+                    """,
+                    (self.user_id, card_id),
+                ).fetchone()
 
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de la lecture de l'état de la carte : %s", e)
+            return None
+
+    @instrumented
     def get_stats(self):
-        # Récupérer les statistiques
+        # Statistiques quotidiennes de l'utilisateur : (date, bonnes, mauvaises)
         try:
-            conn = self.connect()
-            c = conn.cursor()
-            c.execute("SELECT * FROM stats ORDER BY date ASC")
-            results = (
-                c.fetchall()
-            )  # Liste de tuples (id, bonnes_reponses, mauvaises_reponses, date)
+            with self.connection() as conn:
+                results = conn.execute(
+                    """
+                    SELECT date, bonnes_reponses, mauvaises_reponses FROM user_stats
+                    WHERE user_id = ? ORDER BY date
+                    """,
+                    (self.user_id,),
+                ).fetchall()
+            logger.debug("✅ Statistiques de %s récupérées.", self.user_id)
+            return results
 
-            if not results:
-                print("⚠️ Aucune entrée trouvée.")
-                return []
-            else:
-                print(f"✅ {len(results)} entrée(s) récupérée(s) avec succès.")
-                return results
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de la récupération des statistiques : %s", e)
+            return []
 
+
+class GradingManager(Database):
+    """
+    Correction automatique des réponses libres. La forme normalisée des réponses
+    attendues est lue dans card_answers (calculée à l'écriture des cartes) :
+    corriger une saisie ne normalise que la saisie.
+    """
+
+    def __init__(self, db_name=DB_PATH, seuil=answer_grading.SEUIL_CORRECT):
+        super().__init__(db_name)
+        self.seuil = seuil
+
+    @instrumented
+    def grade(self, card_id, saisie):
+        # Corrige une saisie : (juste, score entre 0 et 1), None si la carte
+        # n'existe plus (supprimée pendant le quizz) et ne peut pas être corrigée
+        resultat = self.grade_many([(card_id, saisie)])[0]
+        if resultat is None:
+            logger.warning(
+                "⚠️ Carte avec l'id %s introuvable, saisie non corrigée.", card_id
+            )
+        return resultat
+
+    @instrumented
+    def grade_many(self, submissions):
+        # Corrige en lot des saisies (card_id, saisie) : une lecture par paquet de
+        # MAX_SQL_PARAMS cartes. Renvoie les (juste, score) dans l'ordre, None pour
+        # une carte introuvable.
+        submissions = list(submissions)
+        try:
+            with self.connection() as conn:
+                formes = self._load_answers(
+                    conn, list(dict.fromkeys(card_id for card_id, _ in submissions))
+                )
         except sqlite3.Error as e:
-            print(f"❌ Erreur lors de la récupération des statistiques : {e}")
+            logger.error("❌ Erreur lors de la correction des réponses : %s", e)
+            return [None] * len(submissions)
+
+        resultats = []
+        for card_id, saisie in submissions:
+            forme = formes.get(card_id)
+            resultats.append(
+                None
+                if forme is None
+                else answer_grading.grade(*forme, saisie, seuil=self.seuil)
+            )
+        logger.debug("✅ %s réponse(s) corrigée(s).", len(resultats))
+        return resultats
+
+    @staticmethod
+    def _load_answers(conn, card_ids):
+        # card_id -> (normalisee, mots). Une réponse sans forme précalculée (modifiée
+        # hors de FlashcardManager) est normalisée à la volée.
+        formes = {}
+        for start in range(0, len(card_ids), MAX_SQL_PARAMS):
+            lot = card_ids[start : start + MAX_SQL_PARAMS]
+            placeholders = ", ".join("?" * len(lot))
+            for card_id, normalisee, mots in conn.execute(
+                f"SELECT card_id, normalisee, mots FROM card_answers "
+                f"WHERE card_id IN ({placeholders})",
+                lot,
+            ):
+                formes[card_id] = (normalisee, mots)
+            manquantes = [card_id for card_id in lot if card_id not in formes]
+            if manquantes:
+                placeholders = ", ".join("?" * len(manquantes))
+                for card_id, reponse in conn.execute(
+                    f"SELECT id, reponse FROM cards WHERE id IN ({placeholders})",
+                    manquantes,
+                ):
+                    formes[card_id] = answer_grading.prepare(reponse)
+        return formes
+
+
+class DuplicateManager(Database):
+    """
+    Cartes presque identiques. Chaque carte est indexée à l'écriture par ses clés
+    MinHash/LSH (table card_lsh, après coup pour un import) : sa carte la plus proche
+    est signalée dans card_duplicates. find_duplicates refait l'analyse du paquet
+    entier à partir de l'index, sans comparer toutes les paires.
+    """
+
+    @instrumented
+    @cached_read
+    def get_duplicates(self, card_id=None, limit=200):
+        # Paires signalées (carte, question, doublon, question, similarité),
+        # les limit plus proches ; limitées à une carte si card_id est donné
+        query = """
+            SELECT d.card_id, c.question, d.doublon_id, o.question, d.similarite
+            FROM card_duplicates d
+            JOIN cards c ON c.id = d.card_id
+            JOIN cards o ON o.id = d.doublon_id
+        """
+        params = []
+        if card_id is not None:
+            query += " WHERE d.card_id = ? OR d.doublon_id = ?"
+            params = [card_id, card_id]
+        query += " ORDER BY d.similarite DESC, d.card_id LIMIT ?"
+        params.append(limit)
+        try:
+            with self.connection() as conn:
+                results = conn.execute(query, params).fetchall()
+            logger.debug("✅ %s doublon(s) signalé(s) récupéré(s).", len(results))
+            return results
+
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de la récupération des doublons : %s", e)
             return []
 
-        finally:
-            conn.close()
+    @instrumented
+    def dismiss(self, card_id, doublon_id):
+        # Retire le signalement d'une paire (cartes proches mais toutes deux voulues)
+        try:
+            with self.transaction() as conn:
+                conn.execute(
+                    """
+                    DELETE FROM card_duplicates
+                    WHERE (card_id = ? AND doublon_id = ?) OR (card_id = ? AND doublon_id = ?)
+                    """,
+                    (card_id, doublon_id, doublon_id, card_id),
+                )
+            logger.debug("✅ Signalement %s / %s retiré.", card_id, doublon_id)
+
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors du retrait du signalement : %s", e)
+
+    @instrumented
+    def find_duplicates(self, seuil=card_dedup.SEUIL_DOUBLON):
+        # Rapport sur tout le paquet : pour chaque carte, sa carte la plus proche parmi
+        # celles qui partagent une de ses clés LSH, si leur similarité exacte atteint
+        # seuil. Dans une clé, chaque carte n'est comparée qu'à ses MAX_CANDIDATS_CLE
+        # voisines (par id) : le nombre de paires reste proportionnel au paquet.
+        # Renvoie les paires (id, id doublon, similarité), les plus proches d'abord.
+        try:
+            with self.connection() as conn:
+                # Parcours de l'index dans l'ordre (bande, clé, card_id) : chaque carte
+                # est appariée aux MAX_CANDIDATS_CLE cartes qui la précèdent dans sa clé
+                paires = set()
+                cle_courante = None
+                for bande, cle, card_id in conn.execute(
+                    "SELECT bande, cle, card_id FROM card_lsh ORDER BY bande, cle, card_id"
+                ):
+                    if (bande, cle) != cle_courante:
+                        cle_courante = (bande, cle)
+                        voisines = deque(maxlen=MAX_CANDIDATS_CLE)
+                    paires.update((autre_id, card_id) for autre_id in voisines)
+                    voisines.append(card_id)
+                ids = list({card_id for paire in paires for card_id in paire})
+                ensembles = {}
+                for start in range(0, len(ids), MAX_SQL_PARAMS):
+                    lot = ids[start : start + MAX_SQL_PARAMS]
+                    placeholders = ", ".join("?" * len(lot))
+                    for card_id, question, reponse in conn.execute(
+                        f"SELECT id, question, reponse FROM cards WHERE id IN ({placeholders})",
+                        lot,
+                    ):
+                        ensembles[card_id] = card_dedup.shingles(question, reponse)
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de la recherche des doublons : %s", e)
+            return []
+
+        # Carte la plus proche de chaque carte (la plus récente de la paire)
+        meilleures = {}
+        for a, b in paires:
+            similarite = card_dedup.jaccard(ensembles.get(a), ensembles.get(b))
+            if similarite >= seuil and similarite > meilleures.get(b, (0.0,))[0]:
+                meilleures[b] = (similarite, a)
+        doublons = sorted(
+            (card_id, doublon_id, round(similarite, 3))
+            for card_id, (similarite, doublon_id) in meilleures.items()
+        )
+        doublons.sort(key=lambda d: -d[2])
+        logger.debug(
+            "✅ %s doublon(s) parmi %s paire(s) candidate(s).",
+            len(doublons),
+            len(paires),
+        )
+        return doublons
+
+    @instrumented
+    def reindex(self, after_id=0, chunk_size=INDEX_CHUNK):
+        # Indexe les cartes d'id > after_id sans clés LSH (importées, ou insérées et
+        # modifiées hors de l'application), par paquets de chunk_size cartes, chacun
+        # dans sa transaction. Renvoie le nombre de cartes examinées.
+        total = 0
+        dernier_id = after_id
+        try:
+            while True:
+                with self.transaction() as conn:
+                    rows = conn.execute(
+                        """
+                        SELECT id, question, reponse FROM cards c
+                        WHERE id > ? AND NOT EXISTS
+                        (SELECT 1 FROM card_lsh l WHERE l.card_id = c.id)
+                        ORDER BY id LIMIT ?
+                        """,
+                        (dernier_id, chunk_size),
+                    ).fetchall()
+                    if not rows:
+                        break
+                    index_duplicates(conn, rows)
+                total += len(rows)
+                dernier_id = rows[-1][0]
+            logger.debug("✅ %s carte(s) réindexée(s).", total)
+
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de l'indexation des cartes : %s", e)
+
+        return total
+
+
+_index_executor = None
+_index_executor_lock = threading.Lock()
+
+
+def _get_index_executor():
+    # Thread partagé des calculs différés après un import (un import à la fois)
+    global _index_executor
+    with _index_executor_lock:
+        if _index_executor is None:
+            _index_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="flashcards-indexation"
+            )
+            atexit.register(_index_executor.shutdown)
+        return _index_executor
+
+
+# Bilan d'un import : cartes importées, lignes écartées (thème vide ou absent) et
+# calculs différés (Future de DeckManager.index_cards, None si rien n'a été importé)
+ImportResult = namedtuple("ImportResult", ("importees", "rejetees", "indexation"))
+
+
+class DeckManager(Database):
+    # la classe DeckManager hérite de la classe Database
+    # === Import / export de paquets de cartes (CSV ou JSONL) ===
+    # Colonnes d'un fichier : question, reponse, theme (nom du thème), probabilite (optionnelle)
+    COLUMNS = ("question", "reponse", "theme", "probabilite")
+
+    @instrumented
+    def import_cards(self, source, format=None, chunk_size=10000):
+        # Importe les cartes d'un fichier (chemin ou fichier texte ouvert) par paquets :
+        # chaque paquet est inséré avec executemany dans sa propre transaction.
+        # Les thèmes inconnus sont créés à la volée ; une ligne sans thème est écartée.
+        # Renvoie un ImportResult (le gestionnaire est partagé : rien n'y est conservé).
+        format = self._guess_format(source, format)
+        total = 0
+        rejetees = 0
+        try:
+            with self.connection() as conn:
+                dernier_id = conn.execute(
+                    "SELECT COALESCE(MAX(id), 0) FROM cards"
+                ).fetchone()[0]
+            with self._open(source, "r") as f:
+                rows = self._read_rows(f, format)
+                themes = self._theme_lookup()
+                chunk = []
+                for row in rows:
+                    if not (row.get("theme") or "").strip():
+                        rejetees += 1
+                        continue
+                    chunk.append(row)
+                    if len(chunk) >= chunk_size:
+                        total += self._insert_chunk(chunk, themes)
+                        chunk = []
+                if chunk:
+                    total += self._insert_chunk(chunk, themes)
+            logger.debug("✅ %s carte(s) importée(s) avec succès.", total)
+            if rejetees:
+                logger.warning(
+                    "⚠️ %s ligne(s) sans thème écartée(s) de l'import.", rejetees
+                )
+
+        except (sqlite3.Error, ValueError, KeyError) as e:
+            logger.error(
+                "❌ Erreur lors de l'import des cartes (%s déjà importée(s)) : %s",
+                total,
+                e,
+            )
+
+        indexation = None
+        if total:
+            # Réponses normalisées et index des doublons calculés après coup, en
+            # arrière-plan : l'import ne paie que l'insertion des lignes
+            indexation = _get_index_executor().submit(self.index_cards, dernier_id)
+        return ImportResult(total, rejetees, indexation)
+
+    @instrumented
+    def index_cards(self, after_id=0, chunk_size=INDEX_CHUNK):
+        # Calculs différés des cartes d'id > after_id (import) : réponses normalisées
+        # pour la correction et index des doublons, par paquets de chunk_size cartes,
+        # chacun dans sa transaction. Renvoie le nombre de cartes traitées.
+        total = 0
+        signalees = 0
+        try:
+            while True:
+                with self.transaction() as conn:
+                    rows = conn.execute(
+                        """
+                        SELECT id, question, reponse,
+                        EXISTS (SELECT 1 FROM card_lsh l WHERE l.card_id = c.id)
+                        FROM cards c WHERE id > ? ORDER BY id LIMIT ?
+                        """,
+                        (after_id, chunk_size),
+                    ).fetchall()
+                    if not rows:
+                        break
+                    store_answers(conn, [(row[0], row[2]) for row in rows])
+                    signalees += len(
+                        index_duplicates(conn, [row[:3] for row in rows if not row[3]])
+                    )
+                total += len(rows)
+                after_id = rows[-1][0]
+            if signalees:
+                logger.warning(
+                    "⚠️ %s carte(s) importée(s) proche(s) d'une autre carte.", signalees
+                )
+            logger.debug("✅ %s carte(s) indexée(s).", total)
+
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de l'indexation des cartes : %s", e)
+
+        return total
+
+    @instrumented
+    def export_cards(self, destination, format=None, theme_ids=None, batch_size=10000):
+        # Exporte les cartes (éventuellement filtrées par thème) en lisant le curseur
+        # par paquets, sans charger toute la table en mémoire. Renvoie le nombre de cartes.
+        format = self._guess_format(destination, format)
+        query = """
+            SELECT c.question, c.reponse, t.theme, c.probabilite
+            FROM cards c JOIN themes t ON t.id_theme = c.id_theme
+        """
+        params = []
+        if theme_ids is not None:
+            params = list(dict.fromkeys(theme_ids))
+            query += f" WHERE c.id_theme IN ({', '.join('?' * len(params))})"
+        query += " ORDER BY c.id"
+
+        total = 0
+        try:
+            with self._open(destination, "w") as f, self.connection() as conn:
+                if format == "csv":
+                    writer = csv.writer(f)
+                    writer.writerow(self.COLUMNS)
+                c = conn.execute(query, params)
+                while True:
+                    rows = c.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    if format == "csv":
+                        writer.writerows(rows)
+                    else:
+                        for row in rows:
+                            f.write(
+                                json.dumps(
+                                    dict(zip(self.COLUMNS, row)), ensure_ascii=False
+                                )
+                            )
+                            f.write("\n")
+                    total += len(rows)
+            logger.debug("✅ %s carte(s) exportée(s) avec succès.", total)
+
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de l'export des cartes : %s", e)
+
+        return total
+
+    @staticmethod
+    def _guess_format(source, format):
+        # Le format est déduit de l'extension si le fichier est donné par son chemin
+        if format is None and isinstance(source, (str, os.PathLike)):
+            format = os.path.splitext(os.fspath(source))[1].lstrip(".")
+        format = (format or "").lower()
+        if format not in ("csv", "jsonl"):
+            raise ValueError(
+                f"❌ Format non pris en charge : {format!r} (csv ou jsonl)."
+            )
+        return format
+
+    @staticmethod
+    def _open(source, mode):
+        # Ouvre un chemin ; un fichier déjà ouvert est utilisé tel quel (et laissé ouvert)
+        if isinstance(source, (str, os.PathLike)):
+            return open(source, mode, encoding="utf-8", newline="")
+        if isinstance(source, io.TextIOBase):
+            return _NoClose(source)
+        # Fichier binaire (ex. st.file_uploader) : décodage UTF-8 à la volée
+        return _NoClose(
+            io.TextIOWrapper(source, encoding="utf-8-sig", newline=""), detach=True
+        )
+
+    @staticmethod
+    def _read_rows(f, format):
+        # Itère sur les lignes du fichier sous forme de dictionnaires
+        if format == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _theme_lookup(self):
+        # Table nom de thème -> id_theme, gardée en mémoire pendant l'import
+        with self.connection() as conn:
+            return {
+                theme: id_theme
+                for id_theme, theme in conn.execute("SELECT * FROM themes")
+            }
+
+    def _insert_chunk(self, chunk, themes):
+        with self.transaction() as conn:
+            values = []
+            for row in chunk:
+                nom = row["theme"].strip()
+                if nom not in themes:
+                    themes[nom] = conn.execute(
+                        "INSERT INTO themes (theme) VALUES (?)", (nom,)
+                    ).lastrowid
+                probabilite = row.get("probabilite")
+                probabilite = (
+                    float(probabilite)
+                    if probabilite not in (None, "")
+                    else PROBA_INITIALE
+                )
+                probabilite = max(PROBA_MIN, min(probabilite, PROBA_MAX))
+                values.append(
+                    (row["question"], row["reponse"], probabilite, themes[nom])
+                )
+            conn.executemany(
+                """
+                INSERT INTO cards (question, reponse, probabilite, id_theme)
+                VALUES (?, ?, ?, ?)
+                """,
+                values,
+            )
+        return len(values)
+
+
+class _NoClose:
+    # Enveloppe un fichier fourni par l'appelant : le "with" ne le ferme pas
+    def __init__(self, f, detach=False):
+        self.f = f
+        self.detach = (
+            detach  # Décodeur ajouté par nos soins, à détacher du fichier binaire
+        )
+
+    def __enter__(self):
+        return self.f
+
+    def __exit__(self, *exc):
+        self.f.flush()
+        if self.detach:
+            self.f.detach()
+        return False
+
+
+class WriteBehindRecorder:
+    """
+    File d'écriture différée (optionnelle) devant StatsManager.record_answers.
+    Les réponses sont gardées en mémoire puis écrites par lots depuis un thread
+    d'arrière-plan, dès que max_batch réponses attendent ou au plus tard après
+    max_delay secondes. Un lot en échec est remis en attente : l'essai suivant attend
+    d'abord max_delay secondes, puis deux fois plus à chaque nouvel échec (au plus
+    max_backoff secondes). Les files encore ouvertes sont fermées à la sortie du processus.
+    """
+
+    def __init__(
+        self, stats_manager=None, max_batch=50, max_delay=1.0, max_backoff=30.0
+    ):
+        self.sm = stats_manager or StatsManager()
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_backoff = max_backoff
+        self._backoff = 0.0  # Attente avant le prochain essai après un échec
+        self._pending = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()  # Un seul lot écrit à la fois
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="flashcards-write-behind", daemon=True
+        )
+        self._thread.start()
+        with _recorders_lock:
+            _recorders.add(self)
+
+    def record_answer(self, card_id, is_correct, response_time=None):
+        # Met la réponse en attente, l'écriture se fera avec le prochain lot
+        now = datetime.now().strftime(FORMAT_REVISION)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("❌ La file d'écriture différée est fermée.")
+            self._pending.append((card_id, is_correct, now, response_time))
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify()
+
+    def flush(self):
+        # Écrit immédiatement les réponses en attente depuis le thread appelant.
+        # Renvoie False si elles n'ont pas pu être écrites (elles restent en attente).
+        with self._cond:
+            batch, self._pending = self._pending, []
+        return self._write(batch)
+
+    def close(self):
+        # Arrête le thread d'arrière-plan après l'écriture du dernier lot.
+        # Renvoie False (et journalise les réponses perdues) si cette écriture échoue.
+        with self._cond:
+            if self._closed:
+                return not self._pending
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        with _recorders_lock:
+            _recorders.discard(self)
+        with self._cond:
+            perdues = len(self._pending)
+        if perdues:
+            logger.error(
+                "❌ %s réponse(s) non enregistrée(s) à la fermeture de la file "
+                "d'écriture différée.",
+                perdues,
+            )
+            return False
+        return True
+
+    def _write(self, batch):
+        # Écrit un lot ; en cas d'échec, le remet en tête de la file et renvoie False
+        if not batch:
+            return True
+        with self._write_lock:
+            if self.sm.record_answers(batch):
+                with self._cond:
+                    self._backoff = 0.0
+                return True
+            with self._cond:
+                self._pending[:0] = batch
+                self._backoff = min(
+                    max(self._backoff * 2, self.max_delay), self.max_backoff
+                )
+            return False
+
+    def _run(self):
+        while True:
+            with self._cond:
+                # Après un échec, le lot (même plein) attend la fin du délai de reprise
+                deadline = time.monotonic() + (self._backoff or self.max_delay)
+                while not self._closed and (
+                    self._backoff or len(self._pending) < self.max_batch
+                ):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending, []
+                closed = self._closed
+            self._write(batch)
+            if closed:
+                return
+
+
+_recorders = set()
+_recorders_lock = threading.Lock()
+
+
+@atexit.register
+def _close_recorders():
+    # Un seul gestionnaire de sortie pour toutes les files d'écriture différée
+    with _recorders_lock:
+        recorders = list(_recorders)
+    for recorder in recorders:
+        recorder.close()
+
+
+_quiz_executors = None
+_quiz_executors_lock = threading.Lock()
+
+
+def _get_quiz_executors():
+    # Threads partagés par toutes les sessions de quizz du processus : lectures
+    # anticipées sur deux threads, écritures sur un seul (dans l'ordre des réponses)
+    global _quiz_executors
+    with _quiz_executors_lock:
+        if _quiz_executors is None:
+            _quiz_executors = (
+                ThreadPoolExecutor(max_workers=2, thread_name_prefix="quiz-prefetch"),
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix="quiz-ecriture"),
+            )
+            for executor in _quiz_executors:
+                atexit.register(executor.shutdown)
+        return _quiz_executors
+
+
+class QuizSession:
+    """
+    Déroulé d'un quizz sur une liste d'ids de cartes. Le texte des cartes suivantes
+    est lu en arrière-plan pendant que la carte courante est affichée, et les réponses
+    sont enregistrées en arrière-plan : aucune attente de la base entre deux questions.
+    Utilisation : next_card() pour passer à la carte suivante, current pour la carte
+    affichée, answer() pour répondre à la carte courante, close() en fin de quizz.
+    """
+
+    def __init__(self, app, card_ids, prefetch=2):
+        self.app = app
+        self.card_ids = list(card_ids)
+        self.prefetch = prefetch
+        self.position = -1  # Indice de la carte courante
+        self.current = None
+        self._shown_at = None
+        self._prefetched = {}  # id -> Future de la Card
+        self._pending = []  # Futures des réponses en cours d'enregistrement
+        self._readers, self._writer = _get_quiz_executors()
+
+    def __len__(self):
+        return len(self.card_ids)
+
+    @property
+    def remaining(self):
+        return len(self.card_ids) - self.position - 1
+
+    def _prefetch_from(self, start):
+        # Lance la lecture des cartes [start, start + prefetch) qui ne sont pas déjà lues
+        ids = [
+            card_id
+            for card_id in self.card_ids[start : start + self.prefetch]
+            if card_id not in self._prefetched
+        ]
+        if not ids:
+            return
+        lot = self._readers.submit(self.app.fm.get_cards_by_ids, ids)
+        for card_id in ids:
+            self._prefetched[card_id] = lot
+
+    def next_card(self):
+        # Passe à la carte suivante et la renvoie (None à la fin du quizz)
+        self.position += 1
+        if self.position >= len(self.card_ids):
+            self.position = len(self.card_ids)
+            self.current = None
+            return None
+
+        card_id = self.card_ids[self.position]
+        self._prefetch_from(self.position)
+        lot = self._prefetched.pop(card_id)
+        cartes = {carte.id: carte for carte in lot.result()}
+        self.current = cartes.get(card_id)
+        if self.current is None:
+            # Carte supprimée entre le tirage et l'affichage : on passe à la suivante
+            logger.warning("⚠️ Carte avec l'id %s introuvable, ignorée.", card_id)
+            return self.next_card()
+
+        # Les cartes suivantes se lisent pendant que celle-ci est affichée
+        self._prefetch_from(self.position + 1)
+        self._shown_at = time.monotonic()
+        return self.current
+
+    def answer(self, is_correct, response_time=None):
+        # Enregistre en arrière-plan la réponse à la carte courante. Le temps de réponse
+        # vaut par défaut le temps écoulé depuis l'affichage (next_card).
+        if self.current is None:
+            raise RuntimeError("❌ Aucune carte en cours dans ce quizz.")
+        if response_time is None:
+            response_time = time.monotonic() - self._shown_at
+        self._pending = [f for f in self._pending if not f.done()]
+        future = self._writer.submit(
+            self.app.record_answer, self.current.id, is_correct, response_time
+        )
+        self._pending.append(future)
+        return future
+
+    def close(self):
+        # Attend les réponses en cours d'enregistrement ; False si l'une a échoué
+        ok = all(future.result() for future in self._pending)
+        self._pending = []
+        self._prefetched.clear()
+        return ok
 
 
 class FlashcardApp:
-    def __init__(self):
-        self.fm = FlashcardManager()
-        self.tm = ThemeManager()
-        self.sm = StatsManager()
+    def __init__(
+        self,
+        db_name=DB_PATH,
+        scheduler_mode="leitner",
+        user_id=None,
+        user_shards=None,
+    ):
+        self.fm = FlashcardManager(db_name)
+        self.tm = ThemeManager(db_name)
+        self.sm = StatsManager(db_name)
+        self.scheduler = SchedulerManager(db_name, mode=scheduler_mode)
+        self.dm = DeckManager(db_name)
+        self.grader = GradingManager(db_name)
+        self.duplicates = DuplicateManager(db_name)
+        self.sampler = None  # Échantillonneur optionnel, voir build_sampler
+        # Avec un utilisateur, tirages et réponses utilisent son propre état
+        self.user = (
+            UserManager(user_id, db_name, mode=scheduler_mode, shards=user_shards)
+            if user_id is not None
+            else None
+        )
 
     def get_cards_by_themes(self, theme_ids):
         """
-        Récupère toutes les cartes correspondant à une liste d'identifiants de thème.
+        Récupère toutes les cartes (Card) correspondant à une liste d'identifiants
+        de thème, comme FlashcardManager.get_cards_by_themes.
+        """
+        return self.fm.get_cards_by_themes(theme_ids)
+
+    def get_deck(self, theme_ids):
+        """
+        Paquet des cartes d'une liste de thèmes (Deck) : ids, thèmes et probabilités
+        en tableaux, texte à la demande. À préférer pour tirer des cartes.
+        """
+        return self.fm.get_deck(theme_ids)
+
+    def draw_quiz(self, theme_ids, k):
+        """
+        Tire k identifiants de cartes distincts parmi les thèmes donnés.
+        Seuls (id, probabilite) sont chargés pour le tirage ; le texte des cartes
+        choisies se récupère ensuite avec get_card ou get_cards_by_ids.
+        """
+        if self.user is not None:
+            return self.user.draw_quiz(theme_ids, k)
+        return self.fm.get_deck(theme_ids).sample(k)
+
+    def draw_due_quiz(self, theme_ids, k):
+        """
+        Tire jusqu'à k identifiants de cartes dues (révision espacée), les plus
+        en retard d'abord, par une lecture d'index bornée.
+        """
+        if self.user is not None:
+            return self.user.get_due_cards(theme_ids, limit=k)
+        return self.scheduler.get_due_cards(theme_ids, limit=k)
+
+    def start_quiz(self, theme_ids, k, due=False, prefetch=2):
+        """
+        Tire un quizz (cartes dues si due, sinon tirage pondéré) et renvoie la
+        QuizSession qui le déroule, avec lecture anticipée et réponses en arrière-plan.
         """
-        cards = []
-        for theme_id in theme_ids:
-            cards.extend(self.fm.get_cards_by_theme(theme_id))
-        return cards
+        if due:
+            card_ids = self.draw_due_quiz(theme_ids, k)
+        else:
+            card_ids = self.draw_quiz(theme_ids, k)
+        return QuizSession(self, card_ids, prefetch=prefetch)
 
     def pick_card_weighted(self, cartes, k=1):
         """
-        Tire k carte(s) pondérée(s) en fonction de la probabilité :
+        Tire k carte(s) distinctes pondérées en fonction de la probabilité :
         plus la probabilité est haute, plus la carte a de chances d'être tirée.
-        Si k=1, renvoie une carte unique. Sinon, une liste de cartes.
+        Renvoie une liste de cartes (sans doublon).
         """
         if not cartes:
-            print("❌ Aucune carte disponible.")
+            logger.error("❌ Aucune carte disponible.")
             return None
 
-        # Utiliser la probabilité comme poids (plus elle est haute, plus c’est tiré)
-        poids = [c[3] for c in cartes]
-        total = sum(poids)
-
-        # Uniformisation des poids en cas de probabilités nulles (évite les erreurs avec random.choice)
-        if total == 0:
-            poids = [1.0] * len(cartes)  # fallback
-
-        # Empêche de tirer plus de cartes qu'on en a
-        k = min(k, len(cartes))
+        # Utiliser la probabilité comme poids (plus elle est haute, plus c’est tiré).
+        # Tirage sans remise : un quizz ne repose jamais deux fois la même carte.
+        if isinstance(cartes, Deck):
+            # Tirage sur le tableau des poids, texte lu pour les seules cartes tirées
+            return cartes.cards(cartes.sample(k))
+        return sample_without_replacement(cartes, [c[3] for c in cartes], k)
 
-        tirage = random.choices(cartes, weights=poids, k=k)
+    def build_sampler(self, cartes):
+        """
+        Prépare un échantillonneur sur un paquet de cartes pour des tirages répétés
+        en O(log n). Ses poids suivent les réponses enregistrées via record_answer.
+        """
+        if isinstance(cartes, Deck):
+            self.sampler = FenwickSampler(cartes.ids, cartes.probabilites)
+        else:
+            self.sampler = FenwickSampler(
+                [c[0] for c in cartes], [c[3] for c in cartes]
+            )
+        return self.sampler
 
-        return tirage
+    def record_answer(self, card_id, is_correct, response_time=None):
+        """
+        Enregistre une réponse en base (avec son temps de réponse éventuel),
+        planifie la prochaine révision de la carte et répercute sa nouvelle
+        probabilité dans l'échantillonneur courant.
+        """
+        if self.user is not None:
+            ok = self.user.record_answer(card_id, is_correct, response_time)
+        else:
+            ok = self.sm.record_answer(
+                card_id, is_correct, response_time, scheduler=self.scheduler
+            )
+        if ok and self.sampler is not None and card_id in self.sampler:
+            self.sampler.update(
+                card_id, next_probability(self.sampler.weight(card_id), is_correct)
+            )
+        return ok
 
     def ask_question(self, carte):
         print(f"\n Question : {carte[1]}")
@@ -560,3 +3091,18 @@ class FlashcardApp:
         print(f"✅ Réponse : {carte[2]}")
         rep = input("Aviez-vous bon ? (o/n) : ").strip().lower()
         return rep == "o"
+
+
+_apps = {}
+_apps_lock = threading.Lock()
+
+
+def get_app(db_name=DB_PATH, scheduler_mode="leitner"):
+    # FlashcardApp partagée par tout le processus (et tous les reruns Streamlit),
+    # créée au premier appel après vérification du schéma
+    key = (os.path.abspath(db_name), scheduler_mode)
+    with _apps_lock:
+        if key not in _apps:
+            ensure_schema(db_name)
+            _apps[key] = FlashcardApp(db_name, scheduler_mode=scheduler_mode)
+        return _apps[key]
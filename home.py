@@ -1,34 +1,18 @@
+import logging
 import streamlit as st
-import pandas as pd
-import os
-import random
-
-from flashcard_db import (
-    Database,
-    FlashcardManager,
-    ThemeManager,
-    StatsManager,
-    FlashcardApp,
-)
+
+from flashcard_db import get_app
 
 # Configuration de la mise en page de la page Streamlit
 st.set_page_config(page_title="Accueil", page_icon=":house:", layout="wide")
 
-# Création de la base si elle n'existe pas encore
-if not os.path.exists("flashcards.db"):
-    print("Base de données non trouvée. Initialisation...")
-    db = Database()
-    db.init_db()
-else:
-    print("Base de données déjà existante.")
-
-# Initialisation des gestionnaires
-fm = FlashcardManager()
-tm = ThemeManager()
-sm = StatsManager()
-fa = FlashcardApp()
-print("\n Gestionnaires initialisés avec succès.")
-print("\n")
+logger = logging.getLogger(__name__)
+
+# Gestionnaires partagés par le processus : la base est créée ou mise à niveau
+# au premier appel seulement, pas à chaque rerun
+fa = get_app()
+tm = fa.tm
+logger.debug("Gestionnaires initialisés avec succès.")
 
 # ================================================
 # ========= Titre de la page principale ==========
@@ -60,6 +44,14 @@ st.sidebar.subheader("🎯 Nombre de questions du quizz")
 nb_questions = st.sidebar.slider(
     "Nombre de questions à poser :", min_value=1, max_value=20, value=5
 )
+st.sidebar.write("###")
+
+st.sidebar.subheader("🗓️ Mode de tirage")
+# Tirage pondéré par la probabilité ou cartes dues (révision espacée)
+mode_tirage = st.sidebar.radio(
+    "Cartes à poser :",
+    options=["Tirage pondéré", "Révision espacée (cartes dues)"],
+)
 
 
 # ================================================
@@ -71,13 +63,10 @@ col1, col2, col3 = st.columns([1, 2, 1])
 with col2:
     st.markdown("### Sélectionnez les thèmes puis lancez le quizz")
 
-    # Initialisation des variables de session
-    if "carte_active" not in st.session_state:
-        st.session_state.carte_active = None
-    if "cartes_quizz" not in st.session_state:
-        st.session_state.cartes_quizz = []
-    if "nb_reponses" not in st.session_state:
-        st.session_state.nb_reponses = 0
+    # Initialisation des variables de session : la session de quizz ne garde que
+    # les ids des cartes, le texte des suivantes est lu pendant l'affichage
+    if "quizz" not in st.session_state:
+        st.session_state.quizz = None
     if "reponse_visible" not in st.session_state:
         st.session_state.reponse_visible = False
 
@@ -86,60 +75,77 @@ with col2:
         if themes_selection:
             # Récupère les IDs des thèmes sélectionnés
             theme_ids = [t[0] for t in themes if t[1] in themes_selection]
-            # Récupérer toutes les cartes correspondant à une liste d'identifiants de thème
-            all_cards = fa.get_cards_by_themes(theme_ids)
+            # Tirage des cartes au sort parmis la sélection et en fonction de la probabilité,
+            # ou seules les cartes dont la date de révision est passée (révision espacée)
+            quizz = fa.start_quiz(
+                theme_ids, k=nb_questions, due=mode_tirage != "Tirage pondéré"
+            )
 
-            if not all_cards:
-                st.warning("Aucune carte trouvée pour ces thèmes.")
+            if quizz.next_card() is None:
+                st.warning("Aucune carte à poser pour ces thèmes.")
             else:
-                tirage = random
-
-                # Tirage des cartes au sort parmis la sélection et en fonction de la probabilité
-                tirage = fa.pick_card_weighted(cartes=all_cards, k=nb_questions)
-                print(
-                    f"{nb_questions} cartes tirées au sort parmis les thèmes sélectionnés."
+                logger.debug(
+                    "%s cartes tirées au sort parmis les thèmes sélectionnés.",
+                    len(quizz),
                 )
-                st.session_state.cartes_quizz = tirage
-                st.session_state.nb_reponses = 0
-                st.session_state.carte_active = st.session_state.cartes_quizz[0]
+                st.session_state.quizz = quizz
                 st.session_state.reponse_visible = False
-                st.success(f"{len(tirage)} carte(s) tirée(s) pour le quizz.")
+                st.success(f"{len(quizz)} carte(s) tirée(s) pour le quizz.")
         else:
             st.warning("Veuillez sélectionner au moins un thème.")
 
     # Affichage d'une question si une carte est active
-    if st.session_state.carte_active:
-        carte = st.session_state.carte_active
-        st.markdown(f"**❓ Question {carte[0]} :** {carte[1]}")
+    quizz = st.session_state.quizz
+    if quizz is not None and quizz.current is not None:
+        carte = quizz.current
+        st.markdown(f"**❓ Question {carte.id} :** {carte.question}")
 
-        # Champ de réponse libre
-        user_input = st.text_input("Votre réponse :", key="reponse_utilisateur")
+        # Champ de réponse libre, propre à chaque carte : la saisie de la carte
+        # précédente n'est ni réaffichée ni corrigée
+        cle_reponse = f"reponse_utilisateur_{carte.id}"
+        user_input = st.text_input("Votre réponse :", key=cle_reponse)
 
         # Bouton pour afficher la réponse
         if st.button("Voir la réponse"):
             st.session_state.reponse_visible = True
 
         if st.session_state.reponse_visible:
-            st.markdown(f"**✔️ Réponse attendue :** {carte[2]}")
+            st.markdown(f"**✔️ Réponse attendue :** {carte.reponse}")
+
+            # Correction automatique de la saisie, proposée par défaut (modifiable)
+            juste = True
+            correction = (
+                fa.grader.grade(carte.id, user_input) if user_input.strip() else None
+            )
+            if correction is not None:
+                juste, score = correction
+                st.info(
+                    f"🤖 Correction automatique : {'juste' if juste else 'faux'} "
+                    f"(similarité {score:.0%})"
+                )
             is_correct = st.radio(
-                "Aviez-vous juste ?", options=["Oui", "Non"], horizontal=True
+                "Aviez-vous juste ?",
+                options=["Oui", "Non"],
+                index=0 if juste else 1,
+                horizontal=True,
             )
 
             if st.button("📥 Valider"):
                 correct_bool = is_correct == "Oui"
-                fa.sm.update_stats(correct_bool)
-                fa.sm.update_card_probability(carte[0], correct_bool)
+                # Statistiques, probabilité et prochaine révision sont enregistrées
+                # en arrière-plan (temps de réponse mesuré depuis l'affichage)
+                quizz.answer(correct_bool)
                 st.success("Réponse enregistrée ✅")
 
-                st.session_state.nb_reponses += 1
-                if st.session_state.nb_reponses < len(st.session_state.cartes_quizz):
-                    st.session_state.carte_active = st.session_state.cartes_quizz[
-                        st.session_state.nb_reponses
-                    ]
-                    st.session_state.reponse_visible = False
+                st.session_state.reponse_visible = False
+                st.session_state.pop(cle_reponse, None)
+                if quizz.next_card() is not None:
                     st.rerun()
                 else:
+                    # Attend l'écriture des dernières réponses
+                    if not quizz.close():
+                        st.error(
+                            "❌ Certaines réponses n'ont pas pu être enregistrées."
+                        )
                     st.success("🎉 Quizz terminé !")
-                    st.session_state.carte_active = None
-                    st.session_state.cartes_quizz = []
-                    st.session_state.nb_reponses = 0
+                    st.session_state.quizz = None
@@ -1,15 +1,18 @@
+import logging
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-from flashcard_db import StatsManager
+from datetime import date, timedelta
+from flashcard_db import get_app
 
 # Configuration de la mise en page de la page Streamlit
 st.set_page_config(page_title="Statistiques", page_icon="📊", layout="wide")
 
-# Initialisation des gestionnaires
-sm = StatsManager()
-print("\n Gestionnaires initialisés avec succès.")
-print("\n")
+logger = logging.getLogger(__name__)
+
+# Gestionnaires partagés par le processus
+sm = get_app().sm
+logger.debug("Gestionnaires initialisés avec succès.")
 
 # ================================================
 # ========= Titre de la page principale ==========
@@ -24,44 +27,80 @@ st.divider()
 # ===== Configuration de la page principale  =====
 # ================================================
 
-# Récupération des données
-stats = sm.get_stats()
+# Bornes des statistiques enregistrées (lecture d'index, sans charger la table)
+premiere_date, derniere_date = sm.get_stats_bounds()
 
 # Affichage des résultats
-if not stats:
+if premiere_date is None:
     st.warning("Aucune statistique enregistrée.")
+    date_debut = date_fin = None
 else:
-    df = pd.DataFrame(
-        stats, columns=["ID", "Bonnes réponses", "Mauvaises réponses", "Date"]
+    premiere_date = date.fromisoformat(premiere_date)
+    derniere_date = date.fromisoformat(derniere_date)
+
+    # Choix de la période (par défaut les 90 derniers jours) et du pas des points
+    periode_defaut = (
+        max(premiere_date, derniere_date - timedelta(days=89)),
+        derniere_date,
     )
-    # Convertion de la date au format YYYY-MM-JJ
-    df["Date"] = pd.to_datetime(df["Date"]).dt.strftime("%Y-%m-%d")
-    df = df.sort_values(by="Date")
-    df = df[["Date", "Bonnes réponses", "Mauvaises réponses"]]
-
-    # Calcul du taux de réussite quotidient
-    df["Taux de réussite (%)"] = (
-        df["Bonnes réponses"] / (df["Bonnes réponses"] + df["Mauvaises réponses"]) * 100
-    ).round(1)
+    col1, col2, _ = st.columns((3, 2, 3))
+    with col1:
+        periode = st.date_input(
+            "Période",
+            value=periode_defaut,
+            min_value=premiere_date,
+            max_value=derniere_date,
+        )
+    with col2:
+        pas = st.selectbox("Un point par", options=["Auto", "Jour", "Semaine", "Mois"])
 
-    # Dernière ligne du DataFrame
-    dernier_jour = df.iloc[-1]
+    # Pendant la sélection, date_input ne renvoie que la date de début ;
+    # une fois le champ vidé, il ne renvoie rien : période par défaut
+    if len(periode) == 2:
+        date_debut, date_fin = periode
+    elif len(periode) == 1:
+        date_debut, date_fin = periode[0], derniere_date
+    else:
+        date_debut, date_fin = periode_defaut
+    if pas == "Auto":
+        # Nombre de points borné quelle que soit la durée de la période
+        nb_jours = (date_fin - date_debut).days
+        pas = "Jour" if nb_jours <= 92 else "Semaine" if nb_jours <= 732 else "Mois"
+    bucket = {"Jour": "day", "Semaine": "week", "Mois": "month"}[pas]
 
-    # Affichage du résumé du jour
-    st.markdown(f"### 🧾 Résumé du jour — {dernier_jour['Date']}")
+    # Agrégation, taux de réussite et moyenne glissante calculés en SQL
+    series = sm.get_stats_series(
+        date_debut.isoformat(), date_fin.isoformat(), bucket=bucket, window=7
+    )
+    df = pd.DataFrame(
+        series,
+        columns=[
+            "Période",
+            "Bonnes réponses",
+            "Mauvaises réponses",
+            "Taux de réussite (%)",
+            "Taux glissant (%)",
+        ],
+    )
+
+    # Résumé du dernier jour enregistré
+    dernier_jour = sm.get_stats_series(
+        derniere_date.isoformat(), derniere_date.isoformat()
+    )[0]
+    st.markdown(f"### 🧾 Résumé du jour — {dernier_jour[0]}")
     col1, col2, col3, _ = st.columns(4)
-    col1.metric("✅ Bonnes réponses", dernier_jour["Bonnes réponses"])
-    col2.metric("❌ Mauvaises réponses", dernier_jour["Mauvaises réponses"])
-    col3.metric("🎯 Taux de réussite", f"{dernier_jour['Taux de réussite (%)']:.1f} %")
+    col1.metric("✅ Bonnes réponses", dernier_jour[1])
+    col2.metric("❌ Mauvaises réponses", dernier_jour[2])
+    col3.metric("🎯 Taux de réussite", f"{dernier_jour[3] or 0:.1f} %")
 
-    st.markdown("### 📋 Tableau des performances quotidiennes")
-    st.dataframe(df, use_container_width=True)
+    st.markdown(f"### 📋 Tableau des performances ({pas.lower()})")
+    st.dataframe(df, use_container_width=True, hide_index=True)
 
     # Création de la figure Plotly
     fig = go.Figure()
     fig.add_trace(
         go.Scatter(
-            x=df["Date"],
+            x=df["Période"],
             y=df["Bonnes réponses"],
             mode="lines+markers",
             name="Bonnes réponses",
@@ -69,21 +108,119 @@ else:
     )
     fig.add_trace(
         go.Scatter(
-            x=df["Date"],
+            x=df["Période"],
             y=df["Mauvaises réponses"],
             mode="lines+markers",
             name="Mauvaises réponses",
         )
     )
+    # Taux de réussite glissant (7 dernières périodes) sur un second axe
+    fig.add_trace(
+        go.Scatter(
+            x=df["Période"],
+            y=df["Taux glissant (%)"],
+            mode="lines",
+            name="Taux de réussite glissant (%)",
+            yaxis="y2",
+            line=dict(dash="dot"),
+        )
+    )
 
     # Mise en forme
     fig.update_layout(
         yaxis_title="Nombre de réponses",
+        yaxis2=dict(
+            title="Taux de réussite (%)", overlaying="y", side="right", range=[0, 100]
+        ),
         xaxis=dict(tickangle=45),
         template="plotly_white",
         margin=dict(l=40, r=40, t=40, b=80),
     )
 
     # Affichage dans Streamlit
-    st.markdown("### 📈 Évolution des performances quotidiennes")
+    st.markdown("### 📈 Évolution des performances")
     st.plotly_chart(fig, use_container_width=True)
+
+# ================================================
+# ========= Statistiques par thème ===============
+# ================================================
+
+st.markdown("### 📚 Performances par thème")
+
+# Cumuls par thème, tenus à jour à chaque réponse
+# (limités à la période choisie)
+stats_themes = sm.get_theme_stats(
+    date_debut and date_debut.isoformat(), date_fin and date_fin.isoformat()
+)
+
+if not stats_themes:
+    st.info("Aucune réponse enregistrée par thème pour le moment.")
+else:
+    df_themes = pd.DataFrame(
+        stats_themes,
+        columns=["ID", "Thème", "Bonnes réponses", "Mauvaises réponses"],
+    )
+    df_themes["Taux de réussite (%)"] = (
+        df_themes["Bonnes réponses"]
+        / (df_themes["Bonnes réponses"] + df_themes["Mauvaises réponses"])
+        * 100
+    ).round(1)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.dataframe(df_themes.drop(columns="ID"), use_container_width=True)
+    with col2:
+        fig_themes = go.Figure()
+        fig_themes.add_trace(
+            go.Bar(
+                x=df_themes["Thème"],
+                y=df_themes["Bonnes réponses"],
+                name="Bonnes réponses",
+            )
+        )
+        fig_themes.add_trace(
+            go.Bar(
+                x=df_themes["Thème"],
+                y=df_themes["Mauvaises réponses"],
+                name="Mauvaises réponses",
+            )
+        )
+        fig_themes.update_layout(
+            barmode="stack",
+            yaxis_title="Nombre de réponses",
+            template="plotly_white",
+            margin=dict(l=40, r=40, t=40, b=80),
+        )
+        st.plotly_chart(fig_themes, use_container_width=True)
+
+    # Évolution quotidienne d'un thème
+    theme_choisi = st.selectbox("Évolution quotidienne du thème :", df_themes["Thème"])
+    id_theme_choisi = int(
+        df_themes.loc[df_themes["Thème"] == theme_choisi, "ID"].iloc[0]
+    )
+    df_jour = pd.DataFrame(
+        sm.get_theme_daily_stats(
+            id_theme=id_theme_choisi,
+            date_from=date_debut and date_debut.isoformat(),
+            date_to=date_fin and date_fin.isoformat(),
+        ),
+        columns=["Date", "ID", "Thème", "Bonnes réponses", "Mauvaises réponses"],
+    )
+
+    fig_jour = go.Figure()
+    for colonne in ["Bonnes réponses", "Mauvaises réponses"]:
+        fig_jour.add_trace(
+            go.Scatter(
+                x=df_jour["Date"],
+                y=df_jour[colonne],
+                mode="lines+markers",
+                name=colonne,
+            )
+        )
+    fig_jour.update_layout(
+        yaxis_title="Nombre de réponses",
+        xaxis=dict(tickangle=45),
+        template="plotly_white",
+        margin=dict(l=40, r=40, t=40, b=80),
+    )
+    st.plotly_chart(fig_jour, use_container_width=True)
@@ -1,15 +1,18 @@
+import logging
 import streamlit as st
 import pandas as pd
-from flashcard_db import FlashcardManager, ThemeManager
+import io
+from flashcard_db import get_app
 
 # Configuration de la mise en page de la page Streamlit
 st.set_page_config(page_title="Paramètres", page_icon="🛠️", layout="wide")
 
-# Initialisation des gestionnaires
-fm = FlashcardManager()
-tm = ThemeManager()
-print("\n Gestionnaires initialisés avec succès.")
-print("\n")
+logger = logging.getLogger(__name__)
+
+# Gestionnaires partagés par le processus
+fa = get_app()
+fm, tm, dm, doublons = fa.fm, fa.tm, fa.dm, fa.duplicates
+logger.debug("Gestionnaires initialisés avec succès.")
 
 # ================================================
 # ========= Titre de la page principale ==========
@@ -54,6 +57,12 @@ if "show_get_card" not in st.session_state:
 if "card_id_to_get" not in st.session_state:
     st.session_state.card_id_to_get = None
 
+if "filtre_parcours" not in st.session_state:
+    st.session_state.filtre_parcours = None
+
+if "curseurs_parcours" not in st.session_state:
+    st.session_state.curseurs_parcours = [0]
+
 # ================================================
 # ============= Gestion des thèmes ===============
 # ================================================
@@ -131,9 +140,86 @@ if st.session_state.show_delete_theme:
 
 st.markdown("## **Gestion des cartes**")
 
-cards = fm.get_all_cards()
-nb_cards = fm.get_number_of_cards()
-card_ids = [c[2] for c in cards]
+#########################################################
+# Recherche plein texte dans les questions et réponses
+st.markdown("#### Rechercher une carte")
+
+_, col1, _, col2, _ = st.columns((1, 5, 1, 3, 5))
+with col1:
+    recherche = st.text_input("Mots de la question ou de la réponse")
+with col2:
+    themes_recherche = st.multiselect("Thèmes", options=theme_names)
+
+if recherche.strip():
+    resultats = fm.search(
+        recherche,
+        theme_ids=[t[0] for t in themes if t[1] in themes_recherche] or None,
+        limit=50,
+    )
+    if not resultats:
+        st.info("Aucune carte ne correspond à cette recherche.")
+    else:
+        st.dataframe(
+            pd.DataFrame(
+                [carte.astuple() for carte in resultats],
+                columns=["ID", "Question", "Réponse", "Probabilité", "ID thème"],
+            ),
+            use_container_width=True,
+            hide_index=True,
+        )
+
+#########################################################
+# Parcourir les cartes page par page (seule la page affichée est chargée)
+st.markdown("#### Parcourir les cartes")
+
+_, col1, _, col2, _ = st.columns((1, 5, 1, 3, 5))
+with col1:
+    theme_parcours = st.selectbox(
+        "Thème", options=["Tous les thèmes"] + theme_names, key="theme_parcours"
+    )
+with col2:
+    taille_page = st.selectbox("Cartes par page", options=[25, 50, 100], index=1)
+
+id_theme_parcours = next((t[0] for t in themes if t[1] == theme_parcours), None)
+
+# Pile des curseurs (id de la dernière carte de chaque page précédente),
+# réinitialisée quand le filtre ou la taille de page change
+filtre_parcours = (id_theme_parcours, taille_page)
+if st.session_state.filtre_parcours != filtre_parcours:
+    st.session_state.filtre_parcours = filtre_parcours
+    st.session_state.curseurs_parcours = [0]
+
+page = fm.get_cards_page(
+    after_id=st.session_state.curseurs_parcours[-1],
+    page_size=taille_page,
+    id_theme=id_theme_parcours,
+)
+
+if not page:
+    st.info("Aucune carte à afficher.")
+else:
+    st.dataframe(
+        pd.DataFrame(
+            [carte.astuple() for carte in page],
+            columns=["ID", "Question", "Réponse", "Probabilité", "ID thème"],
+        ),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+_, col1, col2, col3, _ = st.columns((1, 2, 2, 2, 6))
+with col1:
+    if st.button("⬅️ Précédent", disabled=len(st.session_state.curseurs_parcours) == 1):
+        st.session_state.curseurs_parcours.pop()
+        st.rerun()
+with col2:
+    st.markdown(f"Page {len(st.session_state.curseurs_parcours)}")
+with col3:
+    if st.button("Suivant ➡️", disabled=len(page) < taille_page):
+        st.session_state.curseurs_parcours.append(page[-1].id)
+        st.rerun()
+
+st.divider()
 
 #########################################################
 # Afficher le contenu d'une carte
@@ -166,12 +252,12 @@ if st.session_state.show_get_card and st.session_state.card_id_to_get is None:
 # Affichage de la carte sélectionnée
 if st.session_state.card_id_to_get is not None:
     card = fm.get_card(st.session_state.card_id_to_get)
-    theme_of_card = tm.get_theme(card[4])[1]
+    theme_of_card = tm.get_theme(card.id_theme)[1]
 
-    st.markdown(f"**🆔 Numéro de la carte :** {card[0]}")
-    st.markdown(f"**❓ Question :** {card[1]}")
-    st.markdown(f"**✔️ Réponse :** {card[2]}")
-    st.markdown(f"**📚 Thème :** {card [4]} - {theme_of_card}")
+    st.markdown(f"**🆔 Numéro de la carte :** {card.id}")
+    st.markdown(f"**❓ Question :** {card.question}")
+    st.markdown(f"**✔️ Réponse :** {card.reponse}")
+    st.markdown(f"**📚 Thème :** {card.id_theme} - {theme_of_card}")
 
     if st.button("Fermer l'affichage"):
         st.session_state.card_id_to_get = None
@@ -211,14 +297,14 @@ if st.session_state.show_modif_card:
 # Formulaire de modification (après vérification)
 if st.session_state.card_id_to_modify is not None:
     card = fm.get_card(st.session_state.card_id_to_modify)
-    theme_of_card = tm.get_theme(card[4])[1]
+    theme_of_card = tm.get_theme(card.id_theme)[1]
 
     st.markdown("#### Modifier la carte sélectionnée")
     with st.form("form_update_card"):
-        st.markdown(f"**🆔 Numéro de la carte :** {card[0]}")
-        st.markdown(f"**❓ Question :** {card[1]}")
-        st.markdown(f"**✔️ Réponse :** {card[2]}")
-        st.markdown(f"**📚 Thème :** {card [4]} - {theme_of_card}")
+        st.markdown(f"**🆔 Numéro de la carte :** {card.id}")
+        st.markdown(f"**❓ Question :** {card.question}")
+        st.markdown(f"**✔️ Réponse :** {card.reponse}")
+        st.markdown(f"**📚 Thème :** {card.id_theme} - {theme_of_card}")
 
         new_question = st.text_input(
             "Nouvelle question (laisser vide pour ne pas modifier)"
@@ -249,7 +335,7 @@ if st.session_state.card_id_to_modify is not None:
                 update_kwargs["id_theme"] = new_id_theme
 
             if update_kwargs:
-                fm.update_card(id=card[0], **update_kwargs)
+                fm.update_card(id=card.id, **update_kwargs)
                 st.success(f"Numéro de la carte supprimée : {id_card_to_modif}")
             else:
                 st.info("Aucun champ modifié. La carte reste inchangée.")
@@ -313,14 +399,14 @@ if st.session_state.show_delete_card:
 # Formulaire de modification (après vérification)
 if st.session_state.card_id_to_delete is not None:
     card = fm.get_card(st.session_state.card_id_to_delete)
-    theme_of_card = tm.get_theme(card[4])[1]
+    theme_of_card = tm.get_theme(card.id_theme)[1]
 
     st.markdown("#### Supprimer la carte sélectionnée")
     with st.form("form_confirm_delete"):
-        st.markdown(f"**🆔 Numéro de la carte :** {card[0]}")
-        st.markdown(f"**❓ Question :** {card[1]}")
-        st.markdown(f"**✔️ Réponse :** {card[2]}")
-        st.markdown(f"**📚 Thème :** {card [4]} - {theme_of_card}")
+        st.markdown(f"**🆔 Numéro de la carte :** {card.id}")
+        st.markdown(f"**❓ Question :** {card.question}")
+        st.markdown(f"**✔️ Réponse :** {card.reponse}")
+        st.markdown(f"**📚 Thème :** {card.id_theme} - {theme_of_card}")
 
         submitted = st.form_submit_button("Valider la suppression")
 
@@ -332,3 +418,93 @@ if st.session_state.card_id_to_delete is not None:
             st.session_state.card_id_to_delete = None
             st.session_state.show_delete_card = False
             st.rerun()
+
+#########################################################
+# Cartes presque identiques, signalées à l'ajout ou à l'import
+st.markdown("#### Doublons probables")
+
+signales = doublons.get_duplicates()
+if not signales:
+    st.info("Aucun doublon signalé.")
+else:
+    st.dataframe(
+        pd.DataFrame(
+            signales,
+            columns=[
+                "ID",
+                "Question",
+                "ID doublon",
+                "Question du doublon",
+                "Similarité",
+            ],
+        ),
+        use_container_width=True,
+        hide_index=True,
+    )
+    _, col1, col2, _ = st.columns((1, 5, 2, 5))
+    with col1:
+        paire = st.selectbox(
+            "Paire à conserver telle quelle",
+            options=signales,
+            format_func=lambda d: f"{d[0]} / {d[2]} ({d[4]:.0%})",
+        )
+    with col2:
+        st.write("###")
+        if st.button("Ignorer ce signalement"):
+            doublons.dismiss(paire[0], paire[2])
+            st.rerun()
+
+# Analyse de tout le paquet à partir de l'index (cartes modifiées hors de l'application
+# réindexées d'abord)
+if st.button("🔎 Analyser tout le paquet"):
+    doublons.reindex()
+    rapport = doublons.find_duplicates()
+    if not rapport:
+        st.success("Aucune carte presque identique.")
+    else:
+        st.dataframe(
+            pd.DataFrame(rapport, columns=["ID", "ID doublon", "Similarité"]),
+            use_container_width=True,
+            hide_index=True,
+        )
+
+# ================================================
+# =========== Import / export des cartes =========
+# ================================================
+
+st.markdown("## **Import / export des cartes**")
+st.caption(
+    "Fichiers CSV ou JSONL avec les colonnes : question, reponse, theme, probabilite (optionnelle)."
+)
+
+_, col1, _, col2, _ = st.columns((1, 5, 1, 5, 1))
+
+# Import d'un fichier de cartes
+with col1:
+    with st.form("form_import_cards"):
+        fichier = st.file_uploader("Fichier à importer", type=["csv", "jsonl"])
+        submitted = st.form_submit_button("Importer")
+
+        if submitted and fichier is not None:
+            format = fichier.name.rsplit(".", 1)[-1]
+            bilan = dm.import_cards(fichier, format=format)
+            st.success(f"{bilan.importees} carte(s) importée(s).")
+            if bilan.rejetees:
+                st.warning(f"{bilan.rejetees} ligne(s) sans thème ignorée(s).")
+            if bilan.importees:
+                st.caption("Recherche des doublons en cours en arrière-plan.")
+
+# Export des cartes
+with col2:
+    format_export = st.radio(
+        "Format d'export", options=["csv", "jsonl"], horizontal=True
+    )
+    if st.button("Préparer l'export"):
+        export = io.StringIO()
+        dm.export_cards(export, format=format_export)
+        st.download_button(
+            "Télécharger",
+            data=export.getvalue(),
+            file_name=f"flashcards.{format_export}",
+            mime="text/csv" if format_export == "csv" else "application/jsonl",
+        )
@@ -0,0 +1,195 @@
+"""
+Recalcul en masse des probabilités des cartes, vectorisé avec NumPy.
+
+Les probabilités d'un paquet (ou d'un thème) sont chargées en tableaux, recalculées
+en une passe, puis réécrites dans la même transaction (seules les cartes modifiées).
+
+Exemple :
+    engine = ProbabilityEngine()
+    engine.decay(days=7, half_life=30)  # Les cartes non revues depuis 7 jours remontent
+    engine.reset(id_theme=3)  # Toutes les cartes du thème 3 repartent de 0.5
+    ProbabilityEngine(facteur_bonne=0.8).refit()  # Rejoue le journal avec une autre règle
+"""
+
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from flashcard_db import (
+    DB_PATH,
+    FACTEUR_BONNE_REPONSE,
+    FACTEUR_MAUVAISE_REPONSE,
+    FORMAT_REVISION,
+    PROBA_INITIALE,
+    PROBA_MAX,
+    PROBA_MIN,
+    Database,
+    instrumented,
+)
+
+# Silencieux par défaut, comme flashcard_db
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class ProbabilityEngine(Database):
+    """
+    Recalcul des probabilités de toutes les cartes (ou de celles d'un thème) selon
+    une règle de mise à jour paramétrable, par défaut celle de StatsManager.
+    """
+
+    def __init__(
+        self,
+        db_name=DB_PATH,
+        facteur_bonne=FACTEUR_BONNE_REPONSE,
+        facteur_mauvaise=FACTEUR_MAUVAISE_REPONSE,
+        proba_min=PROBA_MIN,
+        proba_max=PROBA_MAX,
+    ):
+        super().__init__(db_name)
+        self.facteur_bonne = facteur_bonne
+        self.facteur_mauvaise = facteur_mauvaise
+        self.proba_min = proba_min
+        self.proba_max = proba_max
+
+    # === Lecture et écriture des tableaux ===
+    @staticmethod
+    def _load(conn, query, params):
+        # (ids, probabilités) en tableaux NumPy à partir d'une requête (id, probabilite)
+        rows = conn.execute(query, params).fetchall()
+        data = np.array(rows, dtype=np.float64).reshape(-1, 2)
+        return data[:, 0].astype(np.int64), data[:, 1]
+
+    @staticmethod
+    def _write(conn, ids, old, new):
+        # Réécrit uniquement les probabilités modifiées, renvoie leur nombre
+        changed = np.flatnonzero(new != old)
+        conn.executemany(
+            "UPDATE cards SET probabilite = ? WHERE id = ?",
+            zip(new[changed].tolist(), ids[changed].tolist()),
+        )
+        return len(changed)
+
+    @staticmethod
+    def _theme_filter(id_theme):
+        if id_theme is None:
+            return "", []
+        return " AND c.id_theme = ?", [id_theme]
+
+    # === Recalculs ===
+    @instrumented
+    def decay(self, days, half_life=30.0, id_theme=None, now=None):
+        # Les cartes non revues depuis days jours remontent vers proba_max : l'écart
+        # restant est divisé par deux toutes les half_life journées écoulées.
+        # À appeler une fois tous les days jours (ex. days=1 chaque nuit).
+        now = now or datetime.now()
+        limite = (now - timedelta(days=days)).strftime(FORMAT_REVISION)
+        where, params = self._theme_filter(id_theme)
+        try:
+            with self.transaction() as conn:
+                ids, probas = self._load(
+                    conn,
+                    f"""
+                    SELECT c.id, COALESCE(c.probabilite, {PROBA_INITIALE}) FROM cards c
+                    LEFT JOIN card_stats cs ON cs.card_id = c.id
+                    WHERE (cs.derniere_revision IS NULL OR cs.derniere_revision < ?)
+                    {where}
+                    """,
+                    [limite] + params,
+                )
+                facteur = 0.5 ** (days / half_life)
+                nouvelles = np.clip(
+                    self.proba_max - (self.proba_max - probas) * facteur,
+                    self.proba_min,
+                    self.proba_max,
+                )
+                nb = self._write(conn, ids, probas, nouvelles)
+            logger.info("✅ Probabilités de %s carte(s) remontées.", nb)
+            return nb
+
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors de la remontée des probabilités : %s", e)
+
+    @instrumented
+    def reset(self, id_theme=None, value=PROBA_INITIALE):
+        # Remet à value la probabilité de toutes les cartes (d'un thème), en une requête
+        try:
+            with self.transaction() as conn:
+                if id_theme is None:
+                    c = conn.execute("UPDATE cards SET probabilite = ?", (value,))
+                else:
+                    c = conn.execute(
+                        "UPDATE cards SET probabilite = ? WHERE id_theme = ?",
+                        (value, id_theme),
+                    )
+            logger.info("✅ Probabilités de %s carte(s) réinitialisées.", c.rowcount)
+            return c.rowcount
+
+        except sqlite3.Error as e:
+            logger.error(
+                "❌ Erreur lors de la réinitialisation des probabilités : %s", e
+            )
+
+    @instrumented
+    def refit(self, id_theme=None, initial=PROBA_INITIALE):
+        # Recalcule les probabilités en rejouant le journal des révisions avec la règle
+        # de l'instance : chaque carte part de initial, puis chaque réponse, dans l'ordre,
+        # multiplie sa probabilité par le facteur correspondant (encadrée).
+        # Les réponses antérieures au journal (schéma < 3) ne sont pas connues.
+        where, params = self._theme_filter(id_theme)
+        try:
+            with self.transaction() as conn:
+                ids, anciennes = self._load(
+                    conn,
+                    f"SELECT c.id, COALESCE(c.probabilite, {PROBA_INITIALE}) FROM cards c "
+                    f"WHERE 1 {where} ORDER BY c.id",
+                    params,
+                )
+                cartes, correct = self._load(
+                    conn,
+                    f"""
+                    SELECT r.card_id, r.correct FROM reviews r
+                    JOIN cards c ON c.id = r.card_id
+                    WHERE 1 {where}
+                    ORDER BY r.card_id, r.date_revision, r.id
+                    """,
+                    params,
+                )
+                nouvelles = self._replay(ids, cartes, correct.astype(bool), initial)
+                nb = self._write(conn, ids, anciennes, nouvelles)
+            logger.info(
+                "✅ Probabilités de %s carte(s) recalculées (%s révisions rejouées).",
+                nb,
+                len(cartes),
+            )
+            return nb
+
+        except sqlite3.Error as e:
+            logger.error("❌ Erreur lors du recalcul des probabilités : %s", e)
+
+    def _replay(self, ids, cartes, correct, initial):
+        # Rejoue les réponses (triées par carte puis par date) : l'étape j applique
+        # en une opération vectorisée la j-ième réponse de chaque carte.
+        probas = np.full(len(ids), float(initial))
+        if len(cartes) == 0:
+            return probas
+        position = np.searchsorted(ids, cartes)
+        facteurs = np.where(correct, self.facteur_bonne, self.facteur_mauvaise)
+
+        # Rang de chaque réponse parmi celles de sa carte
+        debuts = np.flatnonzero(np.r_[True, cartes[1:] != cartes[:-1]])
+        tailles = np.diff(np.r_[debuts, len(cartes)])
+        rang = np.arange(len(cartes)) - np.repeat(debuts, tailles)
+
+        # Réponses regroupées par rang : une carte apparaît au plus une fois par étape
+        ordre = np.argsort(rang, kind="stable")
+        bornes = np.r_[0, np.cumsum(np.bincount(rang))]
+        for j in range(len(bornes) - 1):
+            etape = ordre[bornes[j] : bornes[j + 1]]
+            cible = position[etape]
+            probas[cible] = np.clip(
+                probas[cible] * facteurs[etape], self.proba_min, self.proba_max
+            )
+        return probas